@@ -0,0 +1,77 @@
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import ergastpy
+
+# Writes batches of rows (eg. the seasons yielded by the ergastpy iter_*
+# functions) to a file as they arrive, so only one batch is ever held in memory.
+# The first batch decides the file's columns and their types.
+
+queries = {
+    'results': ergastpy.iter_race_results,
+    'driver_standings': ergastpy.iter_driver_standings,
+    'constructor_standings': ergastpy.iter_constructor_standings,
+}
+
+
+def get_schema(df):
+    # Returns the Arrow schema of a batch. Categorical columns are stored with
+    # 32 bit codes, so later batches with more categories still fit.
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), field.type.value_type)))
+    return schema
+
+
+def write_parquet(batches, path):
+    # Writes every DataFrame of an iterable to a Parquet file, one row group per
+    # batch, and returns the number of rows written.
+    writer = None
+    rows = 0
+    try:
+        for df in batches:
+            if writer is None:
+                schema = get_schema(df)
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.Table.from_pandas(df.reindex(columns=schema.names), schema=schema, preserve_index=False))
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_csv(batches, path):
+    # Appends every DataFrame of an iterable to a CSV file and returns the
+    # number of rows written.
+    columns = None
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        for df in batches:
+            header = columns is None
+            if header:
+                columns = list(df.columns)
+            df.reindex(columns=columns).to_csv(f, header=header, index=False)
+            rows += len(df)
+    return rows
+
+
+def write(batches, path):
+    # Writes batches to a Parquet or CSV file, depending on its extension.
+    if path.endswith('.csv'):
+        return write_csv(batches, path)
+    return write_parquet(batches, path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export every race result or standings list of a range of seasons, one season at a time.')
+    parser.add_argument('query', choices=sorted(queries))
+    parser.add_argument('path', help='File to write to, Parquet unless it ends with .csv.')
+    parser.add_argument('--first', type=int, default=ergastpy.first_season, help='First season to export.')
+    parser.add_argument('--last', type=int, default=pd.Timestamp.today().year, help='Last season to export.')
+    args = parser.parse_args()
+
+    rows = write(queries[args.query](range(args.first, args.last + 1)), args.path)
+    print('Wrote {} rows to {}'.format(rows, args.path))
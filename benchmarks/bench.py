@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# Keep the benchmark's caches out of the app's own cache and store
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+scratch = tempfile.mkdtemp(prefix='f1-bench-')
+os.environ['F1_CACHE_PATH'] = os.path.join(scratch, 'cache.sqlite')
+os.environ['F1_SEASON_STORE_PATH'] = os.path.join(scratch, 'seasons')
+os.environ['F1_DATA_BACKEND'] = 'api'
+sys.path.insert(0, root)
+
+import data_processor
+import data_scraper
+import ergastpy
+import fetch_scheduler
+import http_client
+import local_store
+import mock_ergast
+import plotter
+import response_cache
+import season_store
+
+# Responses recorded from the real API with `bench.py record` go in fixtures.
+# Until there are any, the benchmarks run on the committed synthetic fixtures:
+# made up seasons shaped like 1950, 1985 and 2021, which don't match the real
+# responses' contents or sizes.
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+synthetic_fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'synthetic_fixtures')
+results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+seasons = {'small': 1950, 'medium': 1985, 'large': 2021}
+
+
+def cold_start():
+    # Clears the disk cache and season store so the next call hits the server.
+    response_cache.default_cache.clear()
+    shutil.rmtree(season_store.store_path, ignore_errors=True)
+
+
+def measure(mock, name, season, function, repeat, cold=False):
+    # Runs a function repeat times, recording its wall time, peak memory and
+    # the number of requests it made to the mock server.
+    runs = []
+    for _ in range(repeat):
+        if cold:
+            cold_start()
+        request_count = mock.request_count
+        tracemalloc.start()
+        start = time.perf_counter()
+        function()
+        wall_time = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        runs.append((wall_time, peak_memory, mock.request_count - request_count))
+
+    result = {
+        'benchmark': name,
+        'season': season,
+        'wall_time': statistics.median(run[0] for run in runs),
+        'wall_time_min': min(run[0] for run in runs),
+        'peak_memory': max(run[1] for run in runs),
+        'requests': runs[0][2],
+    }
+    print('{:<48} {:>6} {:>10.4f}s {:>10.1f}MiB {:>6} requests'.format(
+        name, season or '', result['wall_time'], result['peak_memory'] / 2 ** 20, result['requests']))
+    return result
+
+
+def uncached(function):
+    # Returns a Streamlit cached function without its in-memory cache.
+    return getattr(function, '__wrapped__', function)
+
+
+def bench_season(mock, year, repeat):
+    results = []
+    schedule = data_processor.make_column_past_dates(ergastpy.get_schedule(year), 'date')
+    season_length = len(schedule)
+    competitor_types = ['driver', 'constructor'] if year >= 1958 else ['driver']
+
+    for competitor_type in competitor_types:
+        competitor = competitor_type + 'ID'
+        if (competitor_type == 'driver'):
+            competitor_df = ergastpy.get_drivers(year)
+        else:
+            competitor_df = ergastpy.get_constructors(year)
+        competitor_list = competitor_df[competitor_type + 'Id'].tolist()
+
+        get_points = uncached(data_scraper.get_complete_points)
+        results.append(measure(mock, 'data_scraper.get_points[{}]'.format(competitor_type), year,
+                               lambda: get_points(year, competitor_type, season_length, competitor_df),
+                               repeat, cold=True))
+
+        races, failures = http_client.run(data_scraper.get_races(season_length, competitor_type, year))
+        results.append(measure(mock, 'data_processor.build_points_df[{}]'.format(competitor_type), year,
+                               lambda: data_processor.build_points_df(competitor_list, competitor, season_length, races),
+                               repeat))
+
+        points_df = data_processor.build_points_df(competitor_list, competitor, season_length, races)
+        results.append(measure(mock, 'data_processor.get_standings[{}]'.format(competitor_type), year,
+                               lambda: [data_processor.get_standings(points_df, race) for race in range(1, season_length + 1)],
+                               repeat))
+        results.append(measure(mock, 'data_processor.build_standings_index[{}]'.format(competitor_type), year,
+                               lambda: data_processor.build_standings_index(points_df, competitor),
+                               repeat))
+        standings_index = data_processor.build_standings_index(points_df, competitor)
+        selected = set(competitor_list[::2])
+        results.append(measure(mock, 'data_processor.filter_competitors[{}]'.format(competitor_type), year,
+                               lambda: data_processor.filter_competitors(points_df, competitor, keep=selected),
+                               repeat))
+        results.append(measure(mock, 'data_processor.get_round_standings[{}]'.format(competitor_type), year,
+                               lambda: [data_processor.get_round_standings(standings_index, race) for race in range(1, season_length + 1)],
+                               repeat))
+        results.append(measure(mock, 'plotter.draw_line_chart[{}]'.format(competitor_type), year,
+                               lambda: plotter.draw_line_chart(points_df, 'race', 'points', competitor, competitor, competitor, 'Race', 'Points', 'Drivers', 'viridis'),
+                               repeat))
+        plotter.draw_line_chart(points_df, 'race', 'points', competitor, competitor, competitor, 'Race', 'Points', 'Drivers', 'viridis', key='bench')
+        results.append(measure(mock, 'plotter.draw_line_chart[{},cached]'.format(competitor_type), year,
+                               lambda: plotter.draw_line_chart(points_df, 'race', 'points', competitor, competitor, competitor, 'Race', 'Points', 'Drivers', 'viridis', key='bench'),
+                               repeat))
+        scorers_df = data_processor.get_points_scoring_competitors(points_df, season_length)
+        results.append(measure(mock, 'plotter.draw_pie_chart[{}]'.format(competitor_type), year,
+                               lambda: plotter.draw_pie_chart(scorers_df, 'points', competitor, 'viridis'),
+                               repeat))
+    return results
+
+
+def bench_champions(mock, repeat):
+    results = []
+    for competitor_type in ['driver', 'constructor']:
+        get_champ_winners = uncached(data_scraper.get_champ_winners)
+        results.append(measure(mock, 'data_scraper.get_champ_winners[{}]'.format(competitor_type), None,
+                               lambda: get_champ_winners(competitor_type), repeat, cold=True))
+
+        champs_df = data_processor.df_column_to_int(get_champ_winners(competitor_type), 'number_wins')
+        competitor = competitor_type + 'ID'
+        results.append(measure(mock, 'plotter.draw_bar_chart[{}]'.format(competitor_type), None,
+                               lambda: plotter.draw_bar_chart(champs_df, competitor, 'number_wins', 'Competitor', 'Championships Won', competitor, 'viridis'),
+                               repeat))
+    return results
+
+
+def bench_large_chart(mock, repeat):
+    # Times a line chart far bigger than a season (30 competitors over 400
+    # races) drawn in full with WebGL and downsampled to 100 points per line.
+    results = []
+    competitors = ['competitor{}'.format(i) for i in range(30)]
+    race_count = 400
+    points = np.cumsum(np.random.default_rng(0).integers(0, 26, (len(competitors), race_count)), axis=1)
+    points_df = pd.DataFrame({
+        'points': points.ravel().astype('float32'),
+        'race': np.tile(np.arange(1, race_count + 1), len(competitors)).astype('int16'),
+        'driverID': pd.Categorical(np.repeat(competitors, race_count)),
+    })
+    for max_points in [0, 100]:
+        results.append(measure(mock, 'plotter.draw_line_chart[large,max_points={}]'.format(max_points), None,
+                               lambda: plotter.draw_line_chart(points_df, 'race', 'points', 'driverID', 'driverID', 'driverID', 'Race', 'Points', 'Drivers', 'viridis', max_points=max_points),
+                               repeat))
+    return results
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(repeat, upstream=None, rate_limit=True, server=None):
+    # Runs every benchmark against the mock server and returns the results.
+    # Requests without a fixture are answered from the local store if there is
+    # one. server holds the latency, error rate and rate limit to inject.
+    if not rate_limit:
+        fetch_scheduler.requests_per_second = fetch_scheduler.burst = 10 ** 6
+
+    server = server or {}
+    fixtures = 'recorded' if upstream or os.path.isdir(fixtures_dir) else 'synthetic'
+    if fixtures == 'synthetic':
+        print('No recorded fixtures, running on the synthetic ones. Record real responses with `python benchmarks/bench.py record`.')
+    mock = mock_ergast.MockErgast(fixtures_dir if fixtures == 'recorded' else synthetic_fixtures_dir,
+                                  use_store=local_store.has_table('races'), upstream=upstream, **server)
+    http_client.base_url = mock.start()
+    try:
+        results = []
+        for size, year in seasons.items():
+            results += bench_season(mock, year, repeat)
+        results += bench_champions(mock, repeat)
+        results += bench_large_chart(mock, repeat)
+    finally:
+        mock.stop()
+
+    return {
+        'commit': get_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'rate_limit': rate_limit,
+        'fixtures': fixtures,
+        'server': dict(server, errors=mock.error_count, throttled=mock.throttled_count),
+        'results': results,
+    }
+
+
+def save(report):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, '{}-{}.json'.format(report['time'].replace(':', ''), report['commit']))
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare(old_path, new_path):
+    # Prints the change in wall time, peak memory and requests of every
+    # benchmark between two result files.
+    with open(old_path) as f:
+        old_report = json.load(f)
+    with open(new_path) as f:
+        new_report = json.load(f)
+    if old_report.get('fixtures') != new_report.get('fixtures'):
+        print('Warning: the results were run on different fixtures ({} and {}).'.format(old_report.get('fixtures'), new_report.get('fixtures')))
+    old = {(result['benchmark'], result['season']): result for result in old_report['results']}
+    new = new_report['results']
+
+    for result in new:
+        key = (result['benchmark'], result['season'])
+        if key not in old:
+            continue
+        before = old[key]
+        print('{:<48} {:>6} {:>+8.1f}% time {:>+8.1f}% memory {:>+5} requests'.format(
+            key[0], key[1] or '',
+            100 * (result['wall_time'] / before['wall_time'] - 1) if before['wall_time'] else 0,
+            100 * (result['peak_memory'] / before['peak_memory'] - 1) if before['peak_memory'] else 0,
+            result['requests'] - before['requests']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the data pipeline against recorded Ergast responses.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='Run the benchmarks and save the results.')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--no-rate-limit', action='store_true', help='Disable the request rate limit.')
+    run_parser.add_argument('--latency', type=float, default=0.0, help='Seconds the mock server waits before every response.')
+    run_parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests the mock server fails with a 503.')
+    run_parser.add_argument('--server-rate-limit', type=int, help='Requests per second the mock server allows before responding with a 429.')
+    run_parser.add_argument('--seed', type=int, default=0, help='Seed for the injected errors.')
+    record_parser = subparsers.add_parser('record', help='Record any missing fixtures from the real API.')
+    record_parser.add_argument('--upstream', default=http_client.ergast_url)
+    compare_parser = subparsers.add_parser('compare', help='Compare two result files.')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'run':
+            server = {'latency': args.latency, 'error_rate': args.error_rate, 'rate_limit': args.server_rate_limit, 'seed': args.seed}
+            print('Results saved to ' + save(run(args.repeat, rate_limit=not args.no_rate_limit, server=server)))
+        elif args.command == 'record':
+            run(1, upstream=args.upstream)
+        else:
+            compare(args.old, args.new)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
@@ -1,6 +1,15 @@
 from datetime import datetime
 import pandas as pd
 import numpy as np
+import instrumentation
+import response_parser
+
+# Fields of the results parsed into points and stats. IDs are left as objects
+# since they're grouped on, and categoricals would group on every category.
+result_id_fields = {
+    'driverID': (('Driver', 'driverId'), 'object'),
+    'constructorID': (('Constructor', 'constructorId'), 'object'),
+}
 
 
 def get_attribute(df, source_attr, target_attr, value):
@@ -11,10 +20,12 @@ def get_attribute(df, source_attr, target_attr, value):
     return temp_df.iloc[0][target_attr]
 
 
+@instrumentation.timed('transform')
 def make_column_past_dates(df, column_name):
     # Changes a given column in a pandas dataframe to the data datatype
-    # and removes rows where date is in the future.
-    df[column_name]= pd.to_datetime(df[column_name])
+    # (if it isn't already) and removes rows where date is in the future.
+    if not pd.api.types.is_datetime64_any_dtype(df[column_name]):
+        df[column_name]= pd.to_datetime(df[column_name])
     return df.loc[df[column_name] < datetime.now()]
 
 
@@ -31,21 +42,35 @@ def get_race_round(df, column_name, race):
     return int(round_df.iloc[0]['round'])
 
 
+@instrumentation.timed('transform')
+def filter_competitors(df, competitorID, keep=None, drop=None):
+    # Returns the rows of a dataframe whose value in a certain column is in the
+    # set keep (if given) and not in the set drop (if given), using a single
+    # mask. The dataframe itself is returned if no rows are filtered out.
+    mask = np.ones(len(df), dtype=bool)
+    if keep is not None:
+        mask &= df[competitorID].isin(keep).values
+    if drop:
+        mask &= ~df[competitorID].isin(drop).values
+    if mask.all():
+        return df
+    return df.loc[mask]
+
+
 def remove_df_rows(df, competitorID, competitors):
     # Removes all rows of a dataframe where a value in a certain column
     # is present in a given list of values.
-    for competitor in competitors:
-        df = df[df[competitorID] != competitor]
-    return df
+    return filter_competitors(df, competitorID, drop=set(competitors))
 
 
+@instrumentation.timed('transform')
 def get_points_scoring_competitors(df, season_length):
     # Return a pandas dataframe of only drivers or constructors who
     # scored points by the end of the season.
-    point_scorers = df[df['points'] != 0]
-    return point_scorers[point_scorers['race'] == season_length]
+    return df.loc[(df['race'] == season_length) & (df['points'] != 0)]
 
 
+@instrumentation.timed('transform')
 def get_standings(df, round):
     # Return a pandas dataframe of driver or constructor standings after a
     # given race in a season.
@@ -55,82 +80,158 @@ def get_standings(df, round):
     return standings_df
 
 
-def make_constructor_df(response):
-    # Builds a pandas DataFrame from the API resonse json.
-    constructorStandings = response['MRData']['StandingsTable']['StandingsLists'][0]['ConstructorStandings']
-
-    for constructor in constructorStandings:
-        constructor['constructorID'] = constructor['Constructor']['constructorId']
-        constructor['name'] = constructor['Constructor']['name']
-        constructor['nationality'] = constructor['Constructor']['nationality']
-        del constructor['Constructor']
-
-    return pd.DataFrame(constructorStandings)
+@instrumentation.timed('transform')
+def build_standings_index(df, competitor):
+    # Sorts the standings after every race of a season once and returns them as
+    # a dict of pandas dataframes by race, each with every driver/constructor's
+    # position, gap to the leader, gap to the one ahead (NaN for the leader) and
+    # places gained since the previous race.
+    standings_df = df.sort_values(by=['race', 'points'], ascending=[True, False], kind='mergesort', ignore_index=True)
+    by_race = standings_df.groupby('race', sort=False)['points']
+    standings_df['position'] = (by_race.cumcount() + 1).astype('int16')
+    standings_df['gap_to_leader'] = by_race.transform('max') - standings_df['points']
+    standings_df['gap_to_next'] = by_race.shift(1) - standings_df['points']
 
+    # Compare each position with the same competitor's position at the previous race
+    positions = standings_df.pivot(index='race', columns=competitor, values='position')
+    change = (positions.shift(1) - positions).fillna(0).astype('int16').stack().rename('position_change')
+    standings_df = standings_df.join(change, on=['race', competitor])
 
-def make_driver_df(response):
-    # Builds a pandas DataFrame from the API resonse json.
-    driverStandings = response['MRData']['StandingsTable']['StandingsLists'][0]['DriverStandings']
+    columns = ['position', competitor, 'points', 'gap_to_leader', 'gap_to_next', 'position_change', 'race']
+    return {race: race_df[columns].reset_index(drop=True) for race, race_df in standings_df.groupby('race', sort=False)}
 
-    for driver in driverStandings:
-        driver['driverID'] = driver['Driver']['driverId']
-        driver['driver'] = driver['Driver']['givenName'] + ' ' + driver['Driver']['familyName']
-        driver['nationality'] = driver['Driver']['nationality']
-        driver['constructorID'] = driver['Constructors'][0]['constructorId']
-        driver['constructor'] = driver['Constructors'][0]['name']
-        del driver['Driver']
-        del driver['Constructors']
 
-    return pd.DataFrame(driverStandings)
+def get_round_standings(standings_index, round):
+    # Returns the standings after a given race from a standings index, or an
+    # empty dataframe if there are none for that race.
+    if round in standings_index:
+        return standings_index[round]
+    return next(iter(standings_index.values()), pd.DataFrame()).iloc[0:0]
 
 
-def make_driver_champs_df(response):
+@instrumentation.timed('transform')
+def make_constructor_df(response):
     # Builds a pandas DataFrame from the API resonse json.
-    champs = response['MRData']
-
-    driverID = champs['SeasonTable']['driverId']
-    number_wins = champs['total']
+    constructorStandings = response_parser.standings_table(response)[0]['ConstructorStandings']
+    return response_parser.parse_records(constructorStandings, response_parser.constructor_standing_fields)
 
-    return [driverID, number_wins]
 
-
-def make_constructor_champs_df(response):
+@instrumentation.timed('transform')
+def make_driver_df(response):
     # Builds a pandas DataFrame from the API resonse json.
-    champs = response['MRData']
+    driverStandings = response_parser.standings_table(response)[0]['DriverStandings']
+    return response_parser.parse_records(driverStandings, response_parser.driver_standing_fields)
+
+
+@instrumentation.timed('transform')
+def make_champs_df(response, competitor_type):
+    # Builds a pandas DataFrame of how many championships every driver/constructor
+    # won from the API resonse json of the standings leader of every season.
+    competitor = competitor_type.capitalize()
+    seasons = response['MRData']['StandingsTable']['StandingsLists']
+    champs = [season[competitor + 'Standings'][0][competitor][competitor_type + 'Id'] for season in seasons]
+
+    champs_df = pd.Series(champs, dtype=object).value_counts().sort_index()
+    return pd.DataFrame({competitor_type + 'ID': champs_df.index, 'number_wins': champs_df.values})
+
+
+@instrumentation.timed('transform')
+def concat_race_standings(races, competitor):
+    # Stacks the standings DataFrame of every race into one long DataFrame,
+    # tagging each row with the index of the race it came from.
+    tagged = [race_df[[competitor, 'points']].assign(race=race) for race, race_df in races.items()]
+    if not tagged:
+        return pd.DataFrame(columns=[competitor, 'points', 'race'])
+    return pd.concat(tagged, ignore_index=True)
+
+
+@instrumentation.timed('transform')
+def pivot_points(standings_df, competitor_list, competitor, races):
+    # Spreads a long DataFrame of standings onto a full competitor x race grid,
+    # filling in zero points wherever a competitor has no standings entry, and
+    # returns it in the long points/race/competitor format. Points are float32,
+    # races int16 and competitors categorical, in the order of competitor_list.
+    standings_df = standings_df.drop_duplicates(subset=['race', competitor], keep='first')
+    points = pd.to_numeric(standings_df['points']).astype(float)
+    grid = pd.Series(points.values, index=pd.MultiIndex.from_arrays([standings_df[competitor].astype(object), standings_df['race']]))
+    competitors = pd.unique(pd.Series(competitor_list, dtype=object))
+    grid = grid.reindex(pd.MultiIndex.from_product([competitors, races]), fill_value=0.0)
+
+    return pd.DataFrame({
+        'points': grid.values.astype('float32'),
+        'race': np.tile(np.asarray(races, dtype='int16'), len(competitors)),
+        competitor: pd.Categorical.from_codes(np.repeat(np.arange(len(competitors)), len(races)), categories=competitors),
+    })
+
+
+@instrumentation.timed('transform')
+def build_points_df(competitor_list, competitor, race_count, races):
+    # Builds a dataframe of points scored by every driver/constructor at every race in a
+    # given season from DataFrames for each race. Races missing from the dict (eg.
+    # because their request failed) are left out.
+    race_indexes = [race for race in range(0, race_count) if race in races]
+    standings_df = concat_race_standings({race: races[race] for race in race_indexes}, competitor)
 
-    constructorID = champs['SeasonTable']['constructorId']
-    number_wins = champs['total']
+    # The standings at race index 0 are those at the end of the season
+    standings_df.loc[standings_df['race'] == 0, 'race'] = race_count
+    race_order = [race_count if race == 0 else race for race in race_indexes]
+    all_points_df = pivot_points(standings_df, competitor_list, competitor, race_order)
 
-    return [constructorID, number_wins]
+    all_points_df.sort_values(by=['race'], inplace=True, kind='mergesort')
+    return all_points_df
 
 
-def make_all_champs_df(response, table, competitor):
-    # Builds a pandas DataFrame from the API resonse json.
-    champs = response['MRData'][table][competitor]
-
-    return pd.DataFrame(champs)
+@instrumentation.timed('transform')
+def make_results_df(responses):
+    # Builds a pandas DataFrame of the points every driver scored at every race
+    # from API resonse jsons, given as a list of (table, response) pairs where
+    # the table is 'Results' or 'SprintResults'.
+    race_fields = {'race': response_parser.race_fields['round']}
+    fields = dict(result_id_fields, points=response_parser.result_fields['points'])
+    results = [
+        response_parser.parse_nested(response_parser.races_table(response), table, fields, race_fields)
+        for table, response in responses
+    ]
+    if not results:
+        return response_parser.parse_records([], fields, race_fields, [])
+    return pd.concat(results, ignore_index=True)
+
+
+@instrumentation.timed('transform')
+def make_race_results_df(response, table='Results'):
+    # Builds a pandas DataFrame of every classified result in the API resonse
+    # json, with the finishing and grid position of every driver. The table is
+    # 'Results', or 'SprintResults' for a sprint response.
+    race_fields = {'season': response_parser.race_fields['season'], 'race': response_parser.race_fields['round']}
+    fields = dict(result_id_fields, **response_parser.select(response_parser.result_fields, ['position', 'grid', 'points']))
+    return response_parser.parse_nested(response_parser.races_table(response), table, fields, race_fields)
+
+
+@instrumentation.timed('transform')
+def build_points_df_from_results(results_df, competitor_list, competitor, race_count):
+    # Builds the same dataframe as build_points_df, but by adding up the points
+    # scored at each race rather than from the standings after each race.
+    races = list(range(1, race_count + 1))
+    results_df = results_df.loc[results_df['race'] <= race_count]
+
+    if results_df.empty:
+        standings_df = pd.DataFrame(columns=[competitor, 'race', 'points'])
+    else:
+        per_race = results_df.groupby([competitor, 'race'])['points'].sum().unstack('race', fill_value=0)
+        totals = per_race.reindex(columns=races, fill_value=0).cumsum(axis=1)
+        standings_df = totals.stack().rename('points').reset_index()
+
+    all_points_df = pivot_points(standings_df, competitor_list, competitor, races)
+    all_points_df.sort_values(by=['race'], inplace=True, kind='mergesort')
+    return all_points_df
 
 
-def build_points_df(competitor_list, competitor, race_count, races):
-    # Builds a dataframe of points scored by every driver/constructor at every race in a
-    # given season from DataFrames for each race.
-    all_points_df = pd.DataFrame(columns=['points', 'race', competitor])
-
-    for i in range(0, len(competitor_list)):
-        for race in range(0, race_count):
-            current_standings = races[race]
-            current_points_df = current_standings.loc[current_standings[competitor] == competitor_list[i]]
-            current_points_df.reset_index(drop=True, inplace=True)
-            try:
-                current_points = current_points_df.iloc[0]['points']
-                new_row = {'points':float(current_points), 'race':int(race), competitor:competitor_list[i]}
-            except:
-                new_row = {'points':0, 'race':int(race), competitor:competitor_list[i]}
-            all_points_df = all_points_df.append(new_row, ignore_index=True)
-            all_points_df.loc[(all_points_df.race == 0), 'race'] = race_count
-
-    all_points_df.sort_values(by=['race'], inplace=True)
-    return all_points_df
+@instrumentation.timed('transform')
+def append_df(df, new_df):
+    # Appends the rows of one pandas DataFrame to another, which may be None.
+    if df is None:
+        return new_df.reset_index(drop=True)
+    return pd.concat([df, new_df], ignore_index=True)
 
 
 def transpose_list(list):
@@ -139,10 +240,12 @@ def transpose_list(list):
     return transpose.tolist()
 
 
+@instrumentation.timed('transform')
 def list_to_df(list, columns):
     return pd.DataFrame(list, columns=columns)
 
 
+@instrumentation.timed('transform')
 def df_column_to_int(df, column):
     df[column] = pd.to_numeric(df[column])
     return df
@@ -1,109 +1,299 @@
 from datetime import date
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+import time
 import streamlit as st
-import aiohttp
-import asyncio
 import data_processor
-import requests
+import ergastpy
+import fetch_scheduler
+import http_client
+import local_store
+import season_store
+import single_flight
 
 todays_date = date.today()
 current_year = int(todays_date.year)
 
 driver_standings_url = 'http://ergast.com/api/f1/{}/{}/driverStandings.json?limit=1000'
 constructor_standings_url = 'http://ergast.com/api/f1/{}/{}/constructorStandings.json?limit=1000'
-driver_champs = 'http://ergast.com/api/f1/driverStandings/1/drivers.json?limit=1000'
-constructor_champs = 'http://ergast.com/api/f1/constructorStandings/1/constructors.json?limit=1000'
-driver_champ_wins = 'http://ergast.com/api/f1/drivers/{}/driverStandings/1/seasons.json?limit=1000'
-constructor_champ_wins = 'http://ergast.com/api/f1/constructors/{}/constructorStandings/1/seasons.json?limit=1000'
+driver_champs = 'http://ergast.com/api/f1/driverStandings/1.json?limit=1000'
+constructor_champs = 'http://ergast.com/api/f1/constructorStandings/1.json?limit=1000'
+race_results_url = 'http://ergast.com/api/f1/{}/{}/results.json?limit=1000'
+race_sprint_url = 'http://ergast.com/api/f1/{}/{}/sprint.json?limit=1000'
+last_results_url = 'http://ergast.com/api/f1/current/last/results.json?limit=1000'
+
+# Requests that still fail after every retry are logged here
+logger = logging.getLogger(__name__)
+
+# The all-time rankings don't depend on anything chosen on the page, so they are
+# fetched on a background thread while the other sections render, and the
+# result is reused by later reruns for F1_CHAMPS_REFRESH seconds.
+champs_refresh = int(os.environ.get('F1_CHAMPS_REFRESH', 3600))
+
+# Cached points are dropped after F1_POINTS_REFRESH seconds, so a running
+# season picks up changes to results that are already out (eg. penalties).
+# Finished seasons are read back from the season store.
+points_refresh = int(os.environ.get('F1_POINTS_REFRESH', 3600))
+
+_background = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='background-fetch')
+_champ_fetches = {}
+_champ_fetches_lock = threading.Lock()
+
+# Sessions asking for the same season's data at the same time, before st.cache
+# has it, share one fetch
+season_flights = single_flight.Group('season')
 
 
 @st.cache(suppress_st_warning=True, allow_output_mutation=True)
 def get_champ_winners(competitor_type):
+    # Returns a pandas DataFrame of how many championships every driver/constructor
+    # has won.
+    return fetch_champ_winners(competitor_type)
+
+
+def fetch_champ_winners(competitor_type):
+    # Counts the championships every driver/constructor has won from a single
+    # request for the champion of every season. Doesn't use Streamlit, so it can
+    # run on a background thread.
+    if local_store.enabled():
+        return data_processor.list_to_df(local_store.get_champ_wins(competitor_type), [competitor_type + 'ID', 'number_wins'])
+
     if (competitor_type == 'driver'):
-        response = requests.get(driver_champs)
-        champs_df = data_processor.make_all_champs_df(response.json(), 'DriverTable', 'Drivers')
+        response = http_client.get_json(driver_champs)
     else:
-        response = requests.get(constructor_champs)
-        champs_df = data_processor.make_all_champs_df(response.json(), 'ConstructorTable', 'Constructors')
-    
-    champs_list = data_processor.get_column_list(champs_df, competitor_type + "Id")
-    champs = []
-
-    champs = asyncio.run(get_champs(champs_list, competitor_type, champs))
-    
-    return data_processor.list_to_df(champs, [competitor_type + 'ID', 'number_wins'])
-   
-
-@st.cache(suppress_st_warning=True)
-def get_points(year, competitor_type, season_length, competitor_df):
+        response = http_client.get_json(constructor_champs)
+
+    return data_processor.make_champs_df(response, competitor_type)
+
+
+def in_background(function, *args):
+    # Runs a function on the background thread pool and returns its Future. It
+    # runs in a copy of the current context, so its spans go to the current render.
+    context = contextvars.copy_context()
+    return _background.submit(context.run, function, *args)
+
+
+def get_champ_winners_in_background(competitor_type):
+    # Returns a Future of the championships won by every driver/constructor,
+    # starting the fetch if there is no recent one. A fetch that failed is
+    # started again.
+    with _champ_fetches_lock:
+        fetch = _champ_fetches.get(competitor_type)
+        if fetch is not None:
+            future, started = fetch
+            failed = future.done() and future.exception() is not None
+            if not failed and time.time() - started < champs_refresh:
+                return future
+        future = in_background(fetch_champ_winners, competitor_type)
+        _champ_fetches[competitor_type] = (future, time.time())
+        return future
+
+
+class IncompleteData(Exception):
+    # Raised from a cached function instead of returning data missing the
+    # responses of failed requests, as st.cache doesn't keep exceptions. The
+    # next rerun then fetches the data again rather than being served the gaps.
+
+    def __init__(self, df):
+        super().__init__('Some requests failed, so the data is incomplete.')
+        self.df = df
+
+
+def get_points(year, competitor_type, season_length, competitor_df, results_round=None):
     # Returns a pandas DataFrame of the points scored by every driver/constructor
-    # at every race in a given season.
+    # at every race in a given season. For the current season, results_round
+    # (see get_results_round) is part of the cache key, so the points are
+    # fetched again once a race's results are out rather than when the next
+    # race starts, and again every points_refresh seconds to pick up changes
+    # to the latest results. Incomplete points are shown but not cached.
+    try:
+        return get_complete_points(year, competitor_type, season_length, competitor_df, results_round)
+    except IncompleteData as e:
+        return e.df
+
+
+@st.cache(suppress_st_warning=True, ttl=points_refresh)
+def get_complete_points(year, competitor_type, season_length, competitor_df, results_round=None):
     competitor_list = competitor_df[competitor_type + 'Id'].tolist()
-    races = []
+    points_df = season_flights.do((competitor_type + '_points', year, season_length, results_round), season_store.read_or_fetch,
+                                  competitor_type + '_points', year, lambda: fetch_points(year, competitor_type, season_length, competitor_list))
+    if points_df.attrs.get('incomplete'):
+        raise IncompleteData(points_df)
+    return points_df
 
-    # Async
-    races = asyncio.run(get_races(season_length, competitor_type, year, races))
-    race_dict = dict(zip(range(len(races)), races))
 
-    return data_processor.build_points_df(competitor_list, competitor_type + 'ID', season_length, race_dict)
+def get_standings_index(year, competitor_type, season_length, competitor_df, results_round=None):
+    # Returns the standings of every driver/constructor after every race in a
+    # given season, sorted once per season so picking a race is just a lookup.
+    try:
+        return get_complete_standings_index(year, competitor_type, season_length, competitor_df, results_round)
+    except IncompleteData as e:
+        return data_processor.build_standings_index(e.df, competitor_type + 'ID')
 
 
-def get_race_tasks(session, season_length, competitor_type, year):
-    # Creates a list of tasks for an async function.
-    tasks = []
-    for race in range(0, season_length):
-        url = build_race_url(competitor_type, year, race)
-        tasks.append(session.get(url, ssl=False))
-    return tasks
-
-
-async def get_races(season_length, competitor_type, year, races):
-    # Makes API calls asynchronously to create a list of pandas DataFrames.
-    async with aiohttp.ClientSession() as session:
-        tasks = get_race_tasks(session, season_length, competitor_type, year)
-        responses = await asyncio.gather(*tasks)
-        for response in responses:
-            if (competitor_type == 'driver'):
-                standings_df = data_processor.make_driver_df(await response.json())
-            else:
-                standings_df = data_processor.make_constructor_df(await response.json())
-            races.append(standings_df)
-        return races
-
-
-async def get_champs(champs, competitor_type, empty_champs):
-    # Makes API calls asynchronously to create a list of pandas DataFrames.
-    async with aiohttp.ClientSession() as session:
-        tasks = get_champs_tasks(session, competitor_type, champs)
-        responses = await asyncio.gather(*tasks)
-        for response in responses:
-            if (competitor_type == 'driver'):
-                champs_df = data_processor.make_driver_champs_df(await response.json())
+@st.cache(suppress_st_warning=True, allow_output_mutation=True, ttl=points_refresh)
+def get_complete_standings_index(year, competitor_type, season_length, competitor_df, results_round=None):
+    points_df = get_complete_points(year, competitor_type, season_length, competitor_df, results_round)
+    return data_processor.build_standings_index(points_df, competitor_type + 'ID')
+
+
+def get_results_round(year):
+    # Returns the last round of a season that is still running with results
+    # available, or None for finished seasons. A race counts as past from
+    # midnight on race day, but its results only come out after the race.
+    if year < current_year:
+        return None
+    if local_store.enabled():
+        try:
+            return local_store.get_last_round(year, 'results')
+        except IndexError:
+            return 0
+    return get_last_round()
+
+
+def fetch_points(year, competitor_type, season_length, competitor_list):
+    # Fetches the standings after every race in a season and builds the points
+    # DataFrame from them. Where the season's points rules allow it, the
+    # standings are derived from a single request for the season's results
+    # instead of one request per race.
+    competitor = competitor_type + 'ID'
+
+    if local_store.enabled():
+        races = local_store.get_races(season_length, competitor_type, year)
+    else:
+        if can_derive_points(year, competitor_type):
+            if year >= current_year:
+                results_df = update_live_results(year, season_length)
             else:
-                champs_df = data_processor.make_constructor_champs_df(await response.json())
-            empty_champs.append(champs_df)
-        return empty_champs
+                results_df = season_store.read_or_fetch('results', year, lambda: get_season_results(year))
+            if not results_df.attrs.get('incomplete'):
+                return data_processor.build_points_df_from_results(results_df, competitor_list, competitor, season_length)
 
+        # Async
+        races, failures = http_client.run(get_races(season_length, competitor_type, year))
+        report_failures(failures)
 
-def get_champs_tasks(session, competitor_type, champs):
-    # Creates a list of tasks for an async function.
-    tasks = []
-    for champ in champs:
-        url = build_champs_url(competitor_type, champ)
-        tasks.append(session.get(url, ssl=False))
-    return tasks
+    points_df = data_processor.build_points_df(competitor_list, competitor, season_length, races)
+    points_df.attrs['incomplete'] = len(races) < season_length
+    return points_df
 
 
-def build_race_url(competitor_type, year, race):
-    # Formats a URL to later be used in an http request.
+def can_derive_points(year, competitor_type):
+    # Returns True if the standings of a season are just the sum of the points
+    # scored in each race. Before 1991 only a driver's best results counted and
+    # before 1979 only a constructor's best placed car scored. Exclusions and
+    # points deductions don't show up in the race results either: Schumacher
+    # was excluded in 1997, Tyrrell in 1984 and McLaren in 2007, and Racing
+    # Point were docked 15 points in 2020. Those seasons fall back to the
+    # standings after each race.
     if (competitor_type == 'driver'):
-        return driver_standings_url.format(year, race)
+        return year >= 1991 and year not in (1997,)
     else:
-        return constructor_standings_url.format(year, race)
-    
+        return year >= 1979 and year not in (1984, 2007, 2020)
+
+
+def get_season_results(year):
+    # Returns a pandas DataFrame of the points scored by every driver at every
+    # race in a season, including sprints.
+    urls = {'Results': ergastpy.season_results_url(year)}
+    if year >= ergastpy.first_sprint_season:
+        urls['SprintResults'] = ergastpy.season_sprint_url(year)
+
+    responses, failures = http_client.run(fetch_scheduler.fetch_all(urls, paged=True))
+    for table, error in failures.items():
+        logger.warning('Request failed: %s (%r)', urls[table], error)
+
+    results_df = data_processor.make_results_df(list(responses.items()))
+    results_df.attrs['incomplete'] = len(failures) > 0
+    return results_df
+
+
+def update_live_results(year, season_length):
+    # Returns the results of every completed race of a season that is still
+    # running. Rounds already in the season store are not fetched again, so a
+    # refresh only requests the races completed since the previous one, and the
+    # latest stored race, whose results can still change with penalties and
+    # reclassifications hours after they first come out.
+    results_df = season_store.read_season('live_results', year)
+    stored_rounds = set() if results_df is None else set(results_df['race'])
+    latest_stored = max(stored_rounds, default=None)
+    rounds = [race for race in range(1, min(season_length, get_last_round()) + 1) if race not in stored_rounds or race == latest_stored]
+    if not rounds:
+        return results_df if results_df is not None else data_processor.make_results_df([])
+
+    urls = {}
+    for race in rounds:
+        urls[('Results', race)] = race_results_url.format(year, race)
+        if year >= ergastpy.first_sprint_season:
+            urls[('SprintResults', race)] = race_sprint_url.format(year, race)
+    responses, failures = http_client.run(fetch_scheduler.fetch_all(urls))
+    report_failures({urls[key]: error for key, error in failures.items()})
+
+    # Leave out rounds with a failed request so they are fetched again next
+    # time. A stored round that failed to refresh keeps its stored results.
+    failed_rounds = set(race for table, race in failures)
+    fetched_rounds = set(rounds) - failed_rounds
+    new_df = data_processor.make_results_df(
+        [(table, response) for (table, race), response in responses.items() if race in fetched_rounds]
+    )
+    if results_df is not None:
+        results_df = results_df.loc[~results_df['race'].isin(fetched_rounds)]
+    results_df = data_processor.append_df(results_df, new_df)
+    season_store.write_season('live_results', year, results_df)
+    results_df.attrs['incomplete'] = len(failed_rounds - stored_rounds) > 0
+    return results_df
+
 
-def build_champs_url(competitor_type, competitor):
+def get_last_round():
+    # Returns the round of the most recent race of the current season that has
+    # results, or 0 if there are none yet.
+    races = http_client.get_json(last_results_url)['MRData']['RaceTable']['Races']
+    if not races:
+        return 0
+    return int(races[0]['round'])
+
+
+def report_failures(failures):
+    # Warns that some requests failed after every retry, so the data shown is
+    # incomplete.
+    if not failures:
+        return
+    for url, error in failures.items():
+        logger.warning('Request failed: %s (%r)', url, error)
+    st.warning('{} request(s) to the Ergast API failed, so some data is missing.'.format(len(failures)))
+
+
+def get_race_urls(season_length, competitor_type, year):
+    # Creates a dict of race index -> standings URL for every race in a season.
+    urls = {}
+    for race in range(0, season_length):
+        urls[race] = build_race_url(competitor_type, year, race)
+    return urls
+
+
+async def get_races(season_length, competitor_type, year):
+    # Makes API calls asynchronously to create a dict of pandas DataFrames keyed by
+    # race index, along with a dict of URL -> error for any race that failed.
+    urls = get_race_urls(season_length, competitor_type, year)
+    responses, failures = await fetch_scheduler.fetch_all(urls)
+    if failures and not responses:
+        raise next(iter(failures.values()))
+
+    races = {}
+    for race, response in responses.items():
+        if (competitor_type == 'driver'):
+            races[race] = data_processor.make_driver_df(response)
+        else:
+            races[race] = data_processor.make_constructor_df(response)
+    return races, {urls[race]: error for race, error in failures.items()}
+
+
+def build_race_url(competitor_type, year, race):
     # Formats a URL to later be used in an http request.
     if (competitor_type == 'driver'):
-        return driver_champ_wins.format(competitor)
+        return driver_standings_url.format(year, race)
     else:
-        return constructor_champ_wins.format(competitor)
+        return constructor_standings_url.format(year, race)
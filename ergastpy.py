@@ -1,6 +1,24 @@
-import requests
+from datetime import date
+import functools
+import logging
+import fetch_scheduler
+import http_client
+import local_store
+import response_parser
+import search_index
 import pandas as pd
 
+# Columns identifying the query each row of a batch came from
+race_key_fields = {'season': 'int16', 'round': 'int16'}
+season_key_fields = {'season': 'int16'}
+driver_key_fields = {'driverID': 'category'}
+constructor_key_fields = {'constructorID': 'category'}
+first_season = 1950
+first_sprint_season = 2021
+
+# Requests that still fail after every retry are logged here
+logger = logging.getLogger(__name__)
+
 
 def get_drivers(year=None, race=None):
     """
@@ -64,16 +82,15 @@ def get_drivers(year=None, race=None):
 
     [24 rows x 8 columns]
     """
+    if local_store.enabled():
+        return local_store.get_drivers(year, race)
     if year and race:
         url = 'http://ergast.com/api/f1/{}/drivers.json?limit=1000'.format(year, race)
     elif year:
         url = 'http://ergast.com/api/f1/{}/drivers.json?limit=1000'.format(year, race)
     else:
         url = 'http://ergast.com/api/f1/drivers.json?limit=1000'
-    r = requests.get(url)
-
-    assert r.status_code == 200, 'Cannot connect to Ergast API'
-    drivers = r.json()
+    drivers = fetch_scheduler.get_all_pages(url)
     result = pd.DataFrame(drivers["MRData"]["DriverTable"]['Drivers'])
 
     return result
@@ -121,6 +138,8 @@ def get_constructors(year=None, race=None):
     8        toyota         http://en.wikipedia.org/wiki/Toyota_Racing    Toyota    Japanese
     9      williams  http://en.wikipedia.org/wiki/Williams_Grand_Pr...  Williams     British
     """
+    if local_store.enabled():
+        return local_store.get_constructors(year, race)
     if year and race:
         url = 'http://ergast.com/api/f1/{}/constructors.json?limit=1000'.format(year, race)
     elif year:
@@ -128,9 +147,7 @@ def get_constructors(year=None, race=None):
     else:
         url = 'http://ergast.com/api/f1/constructors.json?limit=1000'
 
-    r = requests.get(url)
-    assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-    constructors = r.json()
+    constructors = fetch_scheduler.get_all_pages(url)
     result = pd.DataFrame(constructors["MRData"]["ConstructorTable"]['Constructors'])
 
     return result
@@ -189,6 +206,8 @@ def get_circuits(year=None, race=None):
 
     [16 rows x 7 columns]
     """
+    if local_store.enabled():
+        return local_store.get_circuits(year, race)
     if year and race:
         url = 'http://ergast.com/api/f1/{}/circuits.json?limit=1000'.format(year, race)
     elif year:
@@ -196,9 +215,7 @@ def get_circuits(year=None, race=None):
     else:
         url = 'http://ergast.com/api/f1/circuits.json?limit=1000'
 
-    r = requests.get(url)
-    assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-    circuits = r.json()
+    circuits = fetch_scheduler.get_all_pages(url)
     result = pd.DataFrame(circuits["MRData"]["CircuitTable"]["Circuits"])
 
     # Grabbing latitude, longtitude, locality and country separately
@@ -217,23 +234,28 @@ def get_circuits(year=None, race=None):
     return result
 
 
-def find_driverid(firstname, lastname):
+def find_driverid(firstname, lastname='', limit=None):
     """
     Searches the list of all drivers to find ones that are the same or similar to the input.
+    Driver ids, given names and family names are matched by prefix, substring or spelling,
+    ignoring case and accents, and the best matches come first. The list of drivers is only
+    fetched and indexed on the first search.
 
     Parameters
     ----------
     firstname: str
         The first name of the driver
     lastname: str
-        The last name of the driver
+        An optional parameter that specifies the last name of the driver
+    limit: int
+        An optional parameter that specifies the most drivers to return
 
     Returns
     -------
     pandas.DataFrame
 
     Index:
-        RangeIndex
+        The drivers' index in `get_drivers()`
 
     Columns:
         driverId: str
@@ -247,36 +269,36 @@ def find_driverid(firstname, lastname):
 
     Example
     -------
-    >>> pyergast.find_driverid('peter', 'collins')
+    >>> pyergast.find_driverid('peter', 'collins', limit=4)
              driverId                                                url givenName  ... nationality permanentNumber code
     167       collins  http://en.wikipedia.org/wiki/Peter_Collins_(ra...     Peter  ...     British             NaN  NaN
-    595        peters  http://en.wikipedia.org/wiki/Josef_Peters_(dri...     Josef  ...      German             NaN  NaN
-    596      peterson       http://en.wikipedia.org/wiki/Ronnie_Peterson    Ronnie  ...     Swedish             NaN  NaN
-    809  peter_walker  http://en.wikipedia.org/wiki/Peter_Walker_(dri...     Peter  ...     British             NaN  NaN
+    ...
 
-    [4 rows x 8 columns]
+    Peter Collins matches both names, so he comes before the other drivers called Peter.
     """
-    dfDrivers = get_drivers()
-    result = dfDrivers[
-        dfDrivers['driverId'].str.contains(firstname.lower()) | dfDrivers['driverId'].str.contains(lastname.lower())]
-    return result
+    return get_search_index('driver').find(firstname + ' ' + lastname, limit)
 
 
-def find_constructorid(name):
+def find_constructorid(name, limit=None):
     """
     Searches the list of all constructors to find ones that are the same or similar to the input.
+    Constructor ids and names are matched by prefix, substring or spelling, ignoring case and
+    accents, and the best matches come first. The list of constructors is only fetched and
+    indexed on the first search.
 
     Parameters
     ----------
     name: str
         The name of the constructor
+    limit: int
+        An optional parameter that specifies the most constructors to return
 
     Returns
     -------
     pandas.DataFrame
 
     Index:
-        RangeIndex
+        The constructors' index in `get_constructors()`
 
     Columns:
         constructorId: str
@@ -298,26 +320,29 @@ def find_constructorid(name):
     118        lotus-pw    http://en.wikipedia.org/wiki/Team_Lotus  Lotus-Pratt &amp; Whitney     British
     191      team_lotus    http://en.wikipedia.org/wiki/Team_Lotus                 Team Lotus     British
     """
-    dfConstructors = get_constructors()
-    result = dfConstructors[dfConstructors['constructorId'].str.contains(name.lower())]
-    return result
+    return get_search_index('constructor').find(name, limit)
 
 
-def find_circuitid(circuit):
+def find_circuitid(circuit, limit=None):
     """
-    Searches the list of all the circuits that are similar to the input
+    Searches the list of all the circuits that are similar to the input. Circuit ids, names,
+    localities and countries are matched by prefix, substring or spelling, ignoring case and
+    accents, and the best matches come first. The list of circuits is only fetched and indexed
+    on the first search.
 
     Parameters
     ----------
     circuit: str
         The name of the circuit. Actual circuit name, locality, or country are all accepted.
+    limit: int
+        An optional parameter that specifies the most circuits to return
 
     Returns
     -------
     pandas.DataFrame
 
     Index:
-        RangeIndex
+        The circuits' index in `get_circuits()`
 
     Columns:
         circuitId: str
@@ -337,12 +362,20 @@ def find_circuitid(circuit):
 
     [2 rows x 7 columns]
     """
-    dfCircuits = get_circuits()
-    result = dfCircuits[dfCircuits['circuitId'].str.lower().str.contains(circuit.lower()) |
-                        dfCircuits['circuitName'].str.lower().str.contains(circuit.lower()) |
-                        dfCircuits['Locality'].str.lower().str.contains(circuit.lower()) |
-                        dfCircuits['Country'].str.lower().str.contains(circuit.lower())]
-    return result
+    return get_search_index('circuit').find(circuit, limit)
+
+
+@functools.lru_cache(maxsize=None)
+def get_search_index(kind):
+    """
+    Builds the search index of all drivers, constructors or circuits, once per process.
+    Call `get_search_index.cache_clear()` to pick up newly added ones.
+    """
+    if kind == 'driver':
+        return search_index.SearchIndex(get_drivers(), ['driverId', 'givenName', 'familyName'])
+    elif kind == 'constructor':
+        return search_index.SearchIndex(get_constructors(), ['constructorId', 'name'])
+    return search_index.SearchIndex(get_circuits(), ['circuitId', 'circuitName', 'Locality', 'Country'])
 
 
 def get_race_result(year=None, race=None):
@@ -367,16 +400,16 @@ def get_race_result(year=None, race=None):
     Columns:
         number: int
         position: int
-        positionText: str
+        positionText: category
         grid: int
-        points: int
+        points: float
         driverID: str
         driver: str
-        nationality: str
-        constructorID: str
-        constructor: str
+        nationality: category
+        constructorID: category
+        constructor: category
         laps: int
-        status: str
+        status: category
         Time: dict
 
     Example
@@ -406,32 +439,55 @@ def get_race_result(year=None, race=None):
 
     [20 rows x 13 columns]
     """
+    if local_store.enabled():
+        return local_store.get_race_result(year, race)
+    return parse_race_result(fetch_scheduler.get_all_pages(race_result_url(year, race)))
+
+
+def race_result_url(year=None, race=None):
+    """
+    Returns the URL of the results of a race, or of the most recent race if year and race aren't specified.
+    """
     if year or race:
         assert year and race, 'You must specify both a year and a race'
-        url = 'http://ergast.com/api/f1/{}/{}/results.json?limit=1000'.format(year, race)
-    else:
-        url = 'http://ergast.com/api/f1/current/last/results.json?limit=1000'
-
-    r = requests.get(url)
-    assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-    race_result = r.json()
-    result_dict = race_result["MRData"]['RaceTable']['Races'][0]['Results']
-
-    # Unpack the lists of dicts in result_dict and reformat the result
-    for driver in result_dict:
-        drive_dict = unpack_lists(driver)
-        driver_info = drive_dict[0]
-        constructor_info = drive_dict[1]
-        driver['driver'] = driver_info['givenName'] + ' ' + driver_info['familyName']
-        driver['driverID'] = driver_info['driverId']
-        driver['nationality'] = driver_info['nationality']
-        driver['constructor'] = constructor_info['name']
-        driver['constructorID'] = constructor_info['constructorId']
-
-    # Select the columns that are relevant to the race result
-    cols = ['number', 'position', 'positionText', 'grid', 'points', 'driverID', 'driver',
-            'nationality', 'constructorID', 'constructor', 'laps', 'status', 'Time']
-    return pd.DataFrame(result_dict)[cols]
+        return 'http://ergast.com/api/f1/{}/{}/results.json?limit=1000'.format(year, race)
+    return 'http://ergast.com/api/f1/current/last/results.json?limit=1000'
+
+
+def parse_race_result(race_result):
+    """
+    Builds the DataFrame returned by `get_race_result` from the API response.
+    """
+    result_dict = response_parser.races_table(race_result)[0]['Results']
+    return response_parser.parse_records(result_dict, response_parser.result_fields)
+
+
+async def get_race_result_async(year=None, race=None):
+    """
+    Async counterpart of `get_race_result`, to be awaited on the event loop shared by every request (see `http_client.run`).
+    """
+    if local_store.enabled():
+        return local_store.get_race_result(year, race)
+    return parse_race_result(await get_json_async(race_result_url(year, race)))
+
+
+def get_race_result_batch(races):
+    """
+    Fetches the results of several races concurrently.
+
+    Parameters
+    ----------
+    races: list
+        A list of (year, round) tuples of the races to be queried.
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    The results of every race one after the other, with the columns of `get_race_result`
+    preceded by season: int and round: int.
+    """
+    return fetch_batch(races, race_key_fields, race_result_url, parse_race_result, local_store.get_race_result)
 
 
 def get_qualifying_result(year=None, race=None):
@@ -458,9 +514,9 @@ def get_qualifying_result(year=None, race=None):
         position: int
         driverID: str
         driver: str
-        nationality: str
-        constructorID: str
-        constructor: str
+        nationality: category
+        constructorID: category
+        constructor: category
         Q1: str
         Q2: str
         Q3: str
@@ -492,35 +548,58 @@ def get_qualifying_result(year=None, race=None):
 
     [20 rows x 10 columns]
     """
+    if local_store.enabled():
+        return local_store.get_qualifying_result(year, race)
+    return parse_qualifying_result(fetch_scheduler.get_all_pages(qualifying_result_url(year, race)))
+
+
+def qualifying_result_url(year=None, race=None):
+    """
+    Returns the URL of the qualifying results of a race, or of the most recent race if year and race aren't specified.
+    """
     if year and race:
         assert year >= 1996, 'Qualifying data only available starting from 1996'
-        url = 'http://ergast.com/api/f1/{}/{}/qualifying.json?limit=1000'.format(year, race)
-    else:
-        url = 'http://ergast.com/api/f1/current/last/qualifying.json?limit=1000'
-
-    r = requests.get(url)
-    assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-    race_result = r.json()
-    result_dict = race_result["MRData"]['RaceTable']['Races'][0]['QualifyingResults']
-
-    # Unpack the lists of dicts in result_dict and reformat the result
-    for driver in result_dict:
-        drive_dict = unpack_lists(driver)
-        driver_info = drive_dict[0]
-        constructor_info = drive_dict[1]
-        driver['driver'] = driver_info['givenName'] + ' ' + driver_info['familyName']
-        driver['driverID'] = driver_info['driverId']
-        driver['nationality'] = driver_info['nationality']
-        driver['constructor'] = constructor_info['name']
-        driver['constructorID'] = constructor_info['constructorId']
-
-    # Specify the columns to be returned, taking into account changing qualifying formats
-    cols = ['number', 'position', 'driverID', 'driver', 'nationality', 'constructorID', 'constructor', 'Q1']
-    if 'Q2' in result_dict[0].keys():
-        cols.append('Q2')
-    if 'Q3' in result_dict[0].keys():
-        cols.append('Q3')
-    return pd.DataFrame(result_dict)[cols]
+        return 'http://ergast.com/api/f1/{}/{}/qualifying.json?limit=1000'.format(year, race)
+    return 'http://ergast.com/api/f1/current/last/qualifying.json?limit=1000'
+
+
+def parse_qualifying_result(race_result):
+    """
+    Builds the DataFrame returned by `get_qualifying_result` from the API response.
+    """
+    result_dict = response_parser.races_table(race_result)[0]['QualifyingResults']
+
+    # Only include the sessions of the qualifying format used at the time
+    fields = response_parser.present(response_parser.qualifying_fields, result_dict, ['Q2', 'Q3'])
+    return response_parser.parse_records(result_dict, fields)
+
+
+async def get_qualifying_result_async(year=None, race=None):
+    """
+    Async counterpart of `get_qualifying_result`, to be awaited on the event loop shared by every request (see `http_client.run`).
+    """
+    if local_store.enabled():
+        return local_store.get_qualifying_result(year, race)
+    return parse_qualifying_result(await get_json_async(qualifying_result_url(year, race)))
+
+
+def get_qualifying_result_batch(races):
+    """
+    Fetches the qualifying results of several races concurrently.
+
+    Parameters
+    ----------
+    races: list
+        A list of (year, round) tuples of the races to be queried.
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    The qualifying results of every race one after the other, with the columns of `get_qualifying_result`
+    preceded by season: int and round: int. Q2 and Q3 are missing for races whose qualifying format didn't have them.
+    """
+    return fetch_batch(races, race_key_fields, qualifying_result_url, parse_qualifying_result, local_store.get_qualifying_result)
 
 
 def get_schedule(year=None):
@@ -544,7 +623,7 @@ def get_schedule(year=None):
         round: int
         url: str
         raceName: str
-        date: str
+        date: datetime64
         circuitId: str
         circuitName: str
         locality: str
@@ -565,25 +644,56 @@ def get_schedule(year=None):
 
     [8 rows x 9 columns]
     """
+    if local_store.enabled():
+        return local_store.get_schedule(year)
+    return parse_schedule(fetch_scheduler.get_all_pages(schedule_url(year)))
+
+
+def schedule_url(year=None):
+    """
+    Returns the URL of the schedule of a season, or of the current season if year isn't specified.
+    """
     if year:
-        url = 'http://ergast.com/api/f1/{}.json?limit=1000'.format(year)
-    else:
-        url = 'http://ergast.com/api/f1/current.json?limit=1000'
+        return 'http://ergast.com/api/f1/{}.json?limit=1000'.format(year)
+    return 'http://ergast.com/api/f1/current.json?limit=1000'
 
-    r = requests.get(url)
-    assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-    schedule = r.json()['MRData']['RaceTable']['Races']
 
-    # Unpack the lists of dicts in result_dict and reformat the result
-    for race in schedule:
-        circuit = unpack_lists(race)[0]
-        race['circuitID'] = circuit['circuitId']
-        race['circuitName'] = circuit['circuitName']
-        race['locality'] = circuit['Location']['locality']
-        race['country'] = circuit['Location']['country']
-        del race['Circuit']
+def parse_schedule(response):
+    """
+    Builds the DataFrame returned by `get_schedule` from the API response.
+    """
+    schedule = response_parser.races_table(response)
+
+    # Start times are only available for recent seasons
+    fields = response_parser.present(response_parser.race_fields, schedule, ['time'])
+    return response_parser.parse_records(schedule, fields)
 
-    return pd.DataFrame(schedule)
+
+async def get_schedule_async(year=None):
+    """
+    Async counterpart of `get_schedule`, to be awaited on the event loop shared by every request (see `http_client.run`).
+    """
+    if local_store.enabled():
+        return local_store.get_schedule(year)
+    return parse_schedule(await get_json_async(schedule_url(year)))
+
+
+def get_schedule_batch(years):
+    """
+    Fetches the schedules of several seasons concurrently.
+
+    Parameters
+    ----------
+    years: list
+        A list of the years to be queried.
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    The schedules of every season one after the other, with the columns of `get_schedule`.
+    """
+    return fetch_batch([(year,) for year in years], season_key_fields, schedule_url, parse_schedule, local_store.get_schedule)
 
 
 def driver_standings(year=None, race=None):
@@ -606,14 +716,14 @@ def driver_standings(year=None, race=None):
 
     Columns:
         position: int
-        positionText: str
-        points: int
+        positionText: category
+        points: float
         wins: int
         driverID: str
         driver: str
-        nationality: str
-        constructorID: str
-        constructor: str
+        nationality: category
+        constructorID: category
+        constructor: category
 
     Example
     -------
@@ -633,27 +743,57 @@ def driver_standings(year=None, race=None):
 
     [62 rows x 9 columns]
     """
+    if local_store.enabled():
+        return local_store.driver_standings(year, race)
+    return parse_driver_standings(fetch_scheduler.get_all_pages(driver_standings_url(year, race)))
+
+
+def driver_standings_url(year=None, race=None):
+    """
+    Returns the URL of the driver standings after a race, at the end of a season if race isn't specified,
+    or the latest standings if neither is.
+    """
     if year and race:
-        url = 'http://ergast.com/api/f1/{}/{}/driverStandings.json?limit=1000'.format(year, race)
+        return 'http://ergast.com/api/f1/{}/{}/driverStandings.json?limit=1000'.format(year, race)
     elif year:
-        url = 'http://ergast.com/api/f1/{}/driverStandings.json?limit=1000'.format(year, race)
-    else:
-        url = 'http://ergast.com/api/f1/current/driverStandings.json?limit=1000'
+        return 'http://ergast.com/api/f1/{}/driverStandings.json?limit=1000'.format(year, race)
+    return 'http://ergast.com/api/f1/current/driverStandings.json?limit=1000'
+
+
+def parse_driver_standings(response):
+    """
+    Builds the DataFrame returned by `driver_standings` from the API response.
+    """
+    driverStandings = response_parser.standings_table(response)[0]['DriverStandings']
+    return response_parser.parse_records(driverStandings, response_parser.driver_standing_fields)
+
 
-    r = requests.get(url)
-    assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-    driverStandings = r.json()['MRData']['StandingsTable']['StandingsLists'][0]['DriverStandings']
+async def driver_standings_async(year=None, race=None):
+    """
+    Async counterpart of `driver_standings`, to be awaited on the event loop shared by every request (see `http_client.run`).
+    """
+    if local_store.enabled():
+        return local_store.driver_standings(year, race)
+    return parse_driver_standings(await get_json_async(driver_standings_url(year, race)))
 
-    for driver in driverStandings:
-        driver['driverID'] = driver['Driver']['driverId']
-        driver['driver'] = driver['Driver']['givenName'] + ' ' + driver['Driver']['familyName']
-        driver['nationality'] = driver['Driver']['nationality']
-        driver['constructorID'] = driver['Constructors'][0]['constructorId']
-        driver['constructor'] = driver['Constructors'][0]['name']
-        del driver['Driver']
-        del driver['Constructors']
 
-    return pd.DataFrame(driverStandings)
+def driver_standings_batch(races):
+    """
+    Fetches the driver standings after several races concurrently.
+
+    Parameters
+    ----------
+    races: list
+        A list of (year, round) tuples of the races to be queried.
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    The standings after every race one after the other, with the columns of `driver_standings`
+    preceded by season: int and round: int.
+    """
+    return fetch_batch(races, race_key_fields, driver_standings_url, parse_driver_standings, local_store.driver_standings)
 
 
 def constructor_standings(year=None, race=None):
@@ -676,12 +816,12 @@ def constructor_standings(year=None, race=None):
 
     Columns:
         position: int
-        positionText: str
-        points: int
+        positionText: category
+        points: float
         wins: int
-        constructorID: str
-        constructor: str
-        nationality: str
+        constructorID: category
+        constructor: category
+        nationality: category
 
     Example
     -------
@@ -704,26 +844,59 @@ def constructor_standings(year=None, race=None):
     14       15           15      0    0               re               RE      Rhodesian
     15       16           16      0    0  cooper-maserati  Cooper-Maserati        British
     """
+    if local_store.enabled():
+        return local_store.constructor_standings(year, race)
+    return parse_constructor_standings(fetch_scheduler.get_all_pages(constructor_standings_url(year, race)))
+
+
+def constructor_standings_url(year=None, race=None):
+    """
+    Returns the URL of the constructor standings after a race, at the end of a season if race isn't specified,
+    or the latest standings if neither is.
+    """
     if year and race:
         assert year >= 1958, 'Constructor standings only available starting 1958'
-        url = 'http://ergast.com/api/f1/{}/{}/constructorStandings.json?limit=1000'.format(year, race)
+        return 'http://ergast.com/api/f1/{}/{}/constructorStandings.json?limit=1000'.format(year, race)
     elif year:
         assert year >= 1958, 'Constructor standings only available starting 1958'
-        url = 'http://ergast.com/api/f1/{}/constructorStandings.json?limit=1000'.format(year, race)
-    else:
-        url = 'http://ergast.com/api/f1/current/constructorStandings.json?limit=1000'
+        return 'http://ergast.com/api/f1/{}/constructorStandings.json?limit=1000'.format(year, race)
+    return 'http://ergast.com/api/f1/current/constructorStandings.json?limit=1000'
+
+
+def parse_constructor_standings(response):
+    """
+    Builds the DataFrame returned by `constructor_standings` from the API response.
+    """
+    constructorStandings = response_parser.standings_table(response)[0]['ConstructorStandings']
+    return response_parser.parse_records(constructorStandings, response_parser.constructor_standing_fields)
+
+
+async def constructor_standings_async(year=None, race=None):
+    """
+    Async counterpart of `constructor_standings`, to be awaited on the event loop shared by every request (see `http_client.run`).
+    """
+    if local_store.enabled():
+        return local_store.constructor_standings(year, race)
+    return parse_constructor_standings(await get_json_async(constructor_standings_url(year, race)))
+
+
+def constructor_standings_batch(races):
+    """
+    Fetches the constructor standings after several races concurrently.
 
-    r = requests.get(url)
-    assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-    constructorStandings = r.json()['MRData']['StandingsTable']['StandingsLists'][0]['ConstructorStandings']
+    Parameters
+    ----------
+    races: list
+        A list of (year, round) tuples of the races to be queried.
 
-    for constructor in constructorStandings:
-        constructor['constructorID'] = constructor['Constructor']['constructorId']
-        constructor['name'] = constructor['Constructor']['name']
-        constructor['nationality'] = constructor['Constructor']['nationality']
-        del constructor['Constructor']
+    Returns
+    -------
+    pandas.DataFrame
 
-    return pd.DataFrame(constructorStandings)
+    The standings after every race one after the other, with the columns of `constructor_standings`
+    preceded by season: int and round: int.
+    """
+    return fetch_batch(races, race_key_fields, constructor_standings_url, parse_constructor_standings, local_store.constructor_standings)
 
 
 def query_driver(driverid):
@@ -746,13 +919,13 @@ def query_driver(driverid):
         season: int
         round: int
         position: int
-        positionText: str
-        points: int
+        positionText: category
+        points: float
         wins: int
         driver: str
-        nationality: str
-        constructorID: str
-        constructor: str
+        nationality: category
+        constructorID: category
+        constructor: category
 
     Example
     -------
@@ -777,24 +950,59 @@ def query_driver(driverid):
     16   2019    21       12           12     43    0  Kimi Räikkönen     Finnish          alfa  Alfa Romeo
     17   2020    17       16           16      4    0  Kimi Räikkönen     Finnish          alfa  Alfa Romeo
     """
-    url = 'http://ergast.com/api/f1/drivers/{}/driverStandings.json?limit=1000'.format(driverid)
-    r = requests.get(url)
-    assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-    seasons = r.json()['MRData']['StandingsTable']['StandingsLists']
+    if local_store.enabled():
+        return local_store.query_driver(driverid)
+    return parse_query_driver(fetch_scheduler.get_all_pages(query_driver_url(driverid)))
+
+
+def query_driver_url(driverid):
+    """
+    Returns the URL of the driver standings of every season a driver raced in.
+    """
+    return 'http://ergast.com/api/f1/drivers/{}/driverStandings.json?limit=1000'.format(driverid)
+
+
+def parse_query_driver(response):
+    """
+    Builds the DataFrame returned by `query_driver` from the API response.
+    """
+    seasons = response_parser.standings_table(response)
+
+    # Each season's standings list holds just the driver's final standing
+    fields = response_parser.select(response_parser.driver_standing_fields, [
+        'position', 'positionText', 'points', 'wins', 'driver', 'nationality', 'constructorID', 'constructor'
+    ])
+    fields = dict(response_parser.select(response_parser.race_fields, ['season', 'round']),
+                  **response_parser.nest(fields, 'DriverStandings', 0))
+    return response_parser.parse_records(seasons, fields)
+
+
+async def query_driver_async(driverid):
+    """
+    Async counterpart of `query_driver`, to be awaited on the event loop shared by every request (see `http_client.run`).
+    """
+    if local_store.enabled():
+        return local_store.query_driver(driverid)
+    return parse_query_driver(await get_json_async(query_driver_url(driverid)))
+
+
+def query_driver_batch(driverids):
+    """
+    Fetches the historical driver standings positions of several drivers concurrently.
 
-    # Extracting data from json
-    for season in seasons:
-        for key, value in season['DriverStandings'][0].items():
-            season[key] = value
-        season['driver'] = season['Driver']['givenName'] + ' ' + season['Driver']['familyName']
-        season['nationality'] = season['Driver']['nationality']
-        season['constructorID'] = season['Constructors'][0]['constructorId']
-        season['constructor'] = season['Constructors'][0]['name']
-        del season['DriverStandings']
-        del season['Driver']
-        del season['Constructors']
+    Parameters
+    ----------
+    driverids: list
+        A list of the driver ids of the drivers to be queried.
 
-    return pd.DataFrame(seasons)
+    Returns
+    -------
+    pandas.DataFrame
+
+    The seasons of every driver one after the other, with the columns of `query_driver`
+    preceded by driverID: category.
+    """
+    return fetch_batch([(driverid,) for driverid in driverids], driver_key_fields, query_driver_url, parse_query_driver, local_store.query_driver)
 
 
 def query_constructor(constructorid):
@@ -817,12 +1025,12 @@ def query_constructor(constructorid):
         season: int
         round: int
         position: int
-        positionText: str
-        points: int
+        positionText: category
+        points: float
         wins: int
-        constructorID: str
-        constructor: str
-        nationality: str
+        constructorID: category
+        constructor: category
+        nationality: category
 
     Example
     -------
@@ -840,22 +1048,57 @@ def query_constructor(constructorid):
     9    2019    21        8            8     57    0          alfa  Alfa Romeo     Italian
     10   2020    17        8            8      8    0          alfa  Alfa Romeo     Italian
     """
-    url = 'http://ergast.com/api/f1/constructors/{}/constructorStandings.json?limit=1000'.format(constructorid)
-    r = requests.get(url)
-    assert r.status_code == 200, 'Cannot connect to Ergast API. Check your inputs.'
-    seasons = r.json()['MRData']['StandingsTable']['StandingsLists']
+    if local_store.enabled():
+        return local_store.query_constructor(constructorid)
+    return parse_query_constructor(fetch_scheduler.get_all_pages(query_constructor_url(constructorid)))
+
+
+def query_constructor_url(constructorid):
+    """
+    Returns the URL of the constructor standings of every season a constructor raced in.
+    """
+    return 'http://ergast.com/api/f1/constructors/{}/constructorStandings.json?limit=1000'.format(constructorid)
+
 
-    # Extracting data from json
-    for season in seasons:
-        for key, value in season['ConstructorStandings'][0].items():
-            season[key] = value
-        season['constructorID'] = season['Constructor']['constructorId']
-        season['constructor'] = season['Constructor']['name']
-        season['nationality'] = season['Constructor']['nationality']
-        del season['Constructor']
-        del season['ConstructorStandings']
+def parse_query_constructor(response):
+    """
+    Builds the DataFrame returned by `query_constructor` from the API response.
+    """
+    seasons = response_parser.standings_table(response)
 
-    return pd.DataFrame(seasons)
+    # Each season's standings list holds just the constructor's final standing
+    fields = dict(response_parser.standing_fields, **response_parser.constructor_fields)
+    fields['nationality'] = (('Constructor', 'nationality'), 'category')
+    fields = dict(response_parser.select(response_parser.race_fields, ['season', 'round']),
+                  **response_parser.nest(fields, 'ConstructorStandings', 0))
+    return response_parser.parse_records(seasons, fields)
+
+
+async def query_constructor_async(constructorid):
+    """
+    Async counterpart of `query_constructor`, to be awaited on the event loop shared by every request (see `http_client.run`).
+    """
+    if local_store.enabled():
+        return local_store.query_constructor(constructorid)
+    return parse_query_constructor(await get_json_async(query_constructor_url(constructorid)))
+
+
+def query_constructor_batch(constructorids):
+    """
+    Fetches the historical constructor standings positions of several constructors concurrently.
+
+    Parameters
+    ----------
+    constructorids: list
+        A list of the constructor ids of the constructors to be queried.
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    The seasons of every constructor one after the other, with the columns of `query_constructor`.
+    """
+    return fetch_batch([(constructorid,) for constructorid in constructorids], constructor_key_fields, query_constructor_url, parse_query_constructor, local_store.query_constructor)
 
 
 def unpack_lists(driver):
@@ -880,4 +1123,211 @@ def unpack_lists(driver):
     for key in driver.keys():
         if isinstance(driver[key], dict):
             result.append(driver[key])
-    return result
\ No newline at end of file
+    return result
+
+
+async def get_json_async(url):
+    """
+    Fetches every page of the JSON of a URL on the shared event loop, within the rate limit shared by every request.
+    """
+    return await fetch_scheduler.get_json_paged(url)
+
+
+def fetch_batch(keys, key_fields, make_url, parse, local_query):
+    """
+    Runs a query for every key concurrently over the shared session and concatenates the results.
+
+    Parameters
+    ----------
+    keys: list
+        A list of tuples of the arguments of each query, eg. (year, round).
+    key_fields: dict
+        The names and dtypes of the columns the arguments of each query are added to the results as.
+        Columns the results already have are cast to these dtypes.
+    make_url: function
+        Returns the URL of a query from its arguments.
+    parse: function
+        Builds the DataFrame of a query from its API response.
+    local_query: function
+        Runs a query on the local store instead of the API.
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    The results of the queries in the order of keys, with a RangeIndex. If some requests failed after
+    every retry, or returned no data, their results are left out and attrs['incomplete'] is True.
+    """
+    keys = list(keys)
+    failures = {}
+    if local_store.enabled():
+        frames = {key: local_query(*key) for key in keys}
+    else:
+        urls = {key: make_url(*key) for key in keys}
+        responses, failures = http_client.run(fetch_scheduler.fetch_all(urls, paged=True))
+        if failures and not responses:
+            raise next(iter(failures.values()))
+
+        # A response without any data (eg. the standings of a race that has
+        # only just finished) counts as failed rather than ending the batch
+        frames = {}
+        for key, response in responses.items():
+            if int(response['MRData']['total']) == 0:
+                failures[key] = ValueError('No data')
+            else:
+                frames[key] = parse(response)
+        for key, error in failures.items():
+            logger.warning('Request failed: %s (%r)', urls[key], error)
+
+    frames = [(key, frames[key]) for key in keys if key in frames]
+    if not frames:
+        return pd.DataFrame(columns=list(key_fields)).astype(key_fields)
+    result = pd.concat([frame for key, frame in frames], ignore_index=True)
+
+    # Concatenating categoricals with different categories gives object columns
+    for column, dtype in frames[0][1].dtypes.items():
+        if dtype.name == 'category' and result[column].dtype.name != 'category':
+            result[column] = result[column].astype('category')
+
+    for name, dtype in key_fields.items():
+        if name in result.columns and result[name].dtype.name != dtype:
+            result[name] = result[name].astype(dtype)
+    missing = [(index, name) for index, name in enumerate(key_fields) if name not in result.columns]
+    for position, (index, name) in enumerate(missing):
+        values = [key[index] for key, frame in frames for _ in range(len(frame))]
+        result.insert(position, name, response_parser.to_column(values, key_fields[name]))
+    result.attrs['incomplete'] = len(failures) > 0
+    return result
+
+
+def get_season_results(year):
+    """
+    Fetches the results of every race in a season with a single (paginated) query.
+
+    Parameters
+    ----------
+    year: int
+        The year to be queried.
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    The results of every race one after the other, with the columns of `get_race_result`
+    preceded by season: int and round: int.
+    """
+    if local_store.enabled():
+        rounds = local_store.get_schedule(year)['round'].tolist()
+        return get_race_result_batch([(year, race) for race in rounds])
+    return parse_season_results(fetch_scheduler.get_all_pages(season_results_url(year)))
+
+
+def season_results_url(year):
+    """
+    Returns the URL of the results of every race in a season.
+    """
+    return 'http://ergast.com/api/f1/{}/results.json?limit=1000'.format(year)
+
+
+def season_sprint_url(year):
+    """
+    Returns the URL of the results of every sprint in a season.
+    """
+    return 'http://ergast.com/api/f1/{}/sprint.json?limit=1000'.format(year)
+
+
+def parse_season_results(response):
+    """
+    Builds the DataFrame returned by `get_season_results` from the API response.
+    """
+    race_fields = response_parser.select(response_parser.race_fields, list(race_key_fields))
+    return response_parser.parse_nested(response_parser.races_table(response), 'Results',
+                                        response_parser.result_fields, race_fields)
+
+
+def iter_seasons(seasons=None):
+    """
+    Returns the seasons to be queried, every season since 1950 if none are specified.
+    """
+    if seasons is None:
+        return range(first_season, date.today().year + 1)
+    return seasons
+
+
+def completed_rounds(year):
+    """
+    Returns the rounds of a season that took place before today. A race held today is left out,
+    as its results and standings may not be out yet.
+    """
+    schedule = get_schedule(year)
+    return schedule.loc[schedule['date'] < pd.Timestamp(date.today()), 'round'].tolist()
+
+
+def iter_race_results(seasons=None):
+    """
+    Yields the results of every race, one season at a time, so queries spanning all of F1 history
+    never hold more than a season in memory. Pass the batches to `batch_sink.write_parquet` or
+    `batch_sink.write_csv` to write them to a file as they arrive.
+
+    Parameters
+    ----------
+    seasons: list
+        An optional parameter that specifies the years to be queried. Defaults to every season.
+
+    Yields
+    ------
+    pandas.DataFrame
+
+    The results of a season, with the columns of `get_season_results`. Seasons without results are skipped.
+    """
+    for year in iter_seasons(seasons):
+        results = get_season_results(year)
+        if not results.empty:
+            yield results
+
+
+def iter_driver_standings(seasons=None):
+    """
+    Yields the driver standings after every race, one season at a time. The standings after each
+    race of a season are fetched concurrently.
+
+    Parameters
+    ----------
+    seasons: list
+        An optional parameter that specifies the years to be queried. Defaults to every season.
+
+    Yields
+    ------
+    pandas.DataFrame
+
+    The standings after every race of a season, with the columns of `driver_standings_batch`.
+    Seasons without any races yet are skipped.
+    """
+    for year in iter_seasons(seasons):
+        rounds = completed_rounds(year)
+        if rounds:
+            yield driver_standings_batch([(year, race) for race in rounds])
+
+
+def iter_constructor_standings(seasons=None):
+    """
+    Yields the constructor standings after every race, one season at a time. The standings after
+    each race of a season are fetched concurrently. Seasons before 1958 are skipped as there was no
+    constructors championship.
+
+    Parameters
+    ----------
+    seasons: list
+        An optional parameter that specifies the years to be queried. Defaults to every season.
+
+    Yields
+    ------
+    pandas.DataFrame
+
+    The standings after every race of a season, with the columns of `constructor_standings_batch`.
+    """
+    for year in iter_seasons(seasons):
+        rounds = completed_rounds(year) if year >= 1958 else []
+        if rounds:
+            yield constructor_standings_batch([(year, race) for race in rounds])
+
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import time
+import urllib.parse
+import http_client
+import response_parser
+
+max_concurrency = int(os.environ.get('ERGAST_MAX_CONCURRENCY', 4))
+requests_per_second = float(os.environ.get('ERGAST_RATE_LIMIT', 4))
+burst = int(os.environ.get('ERGAST_BURST', 4))
+# Rows requested per page of a paginated query. Ergast doesn't return more than
+# 1000 rows per request.
+page_size = int(os.environ.get('ERGAST_PAGE_SIZE', 1000))
+
+_rate_limiter = None
+
+
+class TokenBucket:
+    # Rate limiter that allows short bursts of up to `capacity` requests and
+    # `rate` requests per second on average.
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waits until a token is available and takes it.
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def get_rate_limiter():
+    # Returns the rate limiter shared by every fetch in the process. Must be
+    # called from the shared event loop so the bucket's lock belongs to it.
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = TokenBucket(requests_per_second, burst)
+    return _rate_limiter
+
+
+async def fetch_page(url, semaphore, limiter):
+    # Fetches the JSON of a URL, holding a slot of the semaphore while each
+    # attempt is made. Retries are left to http_client.get_json_async, which
+    # only retries errors that can succeed on another attempt.
+    return await http_client.get_json_async(url, limiter=limiter, semaphore=semaphore)
+
+
+async def fetch_all(urls, max_concurrency=max_concurrency, paged=False):
+    # Fetches the JSON of every URL in a dict of key -> URL, with at most
+    # max_concurrency requests in flight and the shared rate limit applied.
+    # Failed requests are retried by http_client. If paged is True, every page of each
+    # URL is fetched (see get_json_paged). Returns a dict of key -> JSON for
+    # the requests that succeeded and a dict of key -> exception for those that didn't.
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limiter = get_rate_limiter()
+
+    async def fetch(key, url):
+        try:
+            if paged:
+                return key, await get_json_paged(url, semaphore=semaphore), None
+            return key, await fetch_page(url, semaphore, limiter), None
+        except Exception as error:
+            return key, None, error
+
+    results = {}
+    failures = {}
+    for key, payload, error in await asyncio.gather(*[fetch(key, url) for key, url in urls.items()]):
+        if error is None:
+            results[key] = payload
+        else:
+            failures[key] = error
+    return results, failures
+
+
+def page_url(url, limit, offset):
+    # Returns a URL with its limit and offset query parameters replaced.
+    parts = urllib.parse.urlsplit(url)
+    query = [(name, value) for name, value in urllib.parse.parse_qsl(parts.query) if name not in ('limit', 'offset')]
+    query += [('limit', str(limit)), ('offset', str(offset))]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+
+def has_more_pages(response):
+    # Returns True if a page of a query doesn't hold all of its rows.
+    return int(response['MRData']['total']) > int(response['MRData']['offset']) + int(response['MRData']['limit'])
+
+
+async def fetch_pages(url, page_size=page_size, semaphore=None, first=None):
+    # Yields every page of a paginated query in order. The first page (which
+    # can be passed in if it was already fetched) says how many rows there are,
+    # then the remaining pages are all requested at once and each is yielded as
+    # soon as it and the pages before it have arrived.
+    semaphore = semaphore or asyncio.Semaphore(max_concurrency)
+    limiter = get_rate_limiter()
+    if first is None:
+        first = await fetch_page(page_url(url, page_size, 0), semaphore, limiter)
+    yield first
+
+    # Ergast caps the page size, so step by the limit it actually used
+    limit = int(first['MRData']['limit']) or page_size
+    total = int(first['MRData']['total'])
+    tasks = [asyncio.ensure_future(fetch_page(page_url(url, limit, offset), semaphore, limiter))
+             for offset in range(limit, total, limit)]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def get_json_paged(url, page_size=page_size, semaphore=None, first=None):
+    # Returns the JSON of every row of a query as one response, merging each
+    # page into it as it arrives. Queries that fit on one page take one request.
+    response = None
+    async for page in fetch_pages(url, page_size, semaphore, first):
+        if response is None:
+            response = page
+        else:
+            response_parser.merge_page(response, page)
+    return response
+
+
+def get_all_pages(url, page_size=page_size):
+    # Blocking counterpart of get_json_paged. The first page is requested with
+    # http_client.get_json, so queries that fit on one page don't touch the
+    # event loop.
+    first = http_client.get_json(page_url(url, page_size, 0))
+    if not has_more_pages(first):
+        return first
+    return http_client.run(get_json_paged(url, page_size, first=first))
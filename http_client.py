@@ -0,0 +1,178 @@
+import asyncio
+import atexit
+import os
+import threading
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import instrumentation
+import json_codec
+import response_cache
+import single_flight
+
+max_connections_per_host = int(os.environ.get('ERGAST_MAX_CONNECTIONS_PER_HOST', 10))
+request_timeout = float(os.environ.get('ERGAST_TIMEOUT', 30))
+max_retries = int(os.environ.get('ERGAST_RETRIES', 3))
+backoff_factor = float(os.environ.get('ERGAST_BACKOFF', 0.5))
+retry_statuses = (429, 500, 502, 503, 504)
+headers = {'Accept-Encoding': 'gzip, deflate'}
+
+# Requests for the Ergast API are sent to base_url instead, eg. to point the app
+# at a local server for testing.
+ergast_url = 'http://ergast.com/api/f1'
+base_url = os.environ.get('ERGAST_BASE_URL', ergast_url)
+
+_session = None
+_session_lock = threading.Lock()
+_async_session = None
+_loop = None
+_loop_lock = threading.Lock()
+
+# Requests for a URL that is already being fetched (by any thread, sync or
+# async) wait for that request instead of sending their own
+requests_in_flight = single_flight.Group('api')
+
+
+def get_session():
+    # Returns the process-wide requests Session, whose connection pool keeps
+    # connections to the API alive between calls.
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=max_retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=retry_statuses,
+                allowed_methods=['GET'],
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_maxsize=max_connections_per_host, max_retries=retry)
+            _session = requests.Session()
+            _session.headers.update(headers)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def get_loop():
+    # Returns a long-lived event loop running on a background thread. Running
+    # every coroutine on the same loop lets them share one aiohttp session.
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='http-client-loop', daemon=True).start()
+        return _loop
+
+
+def run(coroutine):
+    # Runs a coroutine on the shared event loop and waits for its result.
+    return asyncio.run_coroutine_threadsafe(instrumentation.bind(coroutine), get_loop()).result()
+
+
+def get_async_session():
+    # Returns the aiohttp session shared by every coroutine on the shared loop.
+    global _async_session
+    if _async_session is None or _async_session.closed:
+        connector = aiohttp.TCPConnector(limit_per_host=max_connections_per_host, ssl=False)
+        _async_session = aiohttp.ClientSession(
+            connector=connector,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=request_timeout)
+        )
+    return _async_session
+
+
+def close():
+    # Closes the shared sessions when the process exits.
+    if _async_session is not None and not _async_session.closed:
+        run(_async_session.close())
+    if _session is not None:
+        _session.close()
+
+
+atexit.register(close)
+
+
+def resolve(url):
+    # Rewrites an Ergast API URL to go to base_url.
+    if url.startswith(ergast_url):
+        return base_url + url[len(ergast_url):]
+    return url
+
+
+def get_json(url):
+    # Returns the decoded JSON for a GET request, answering from the disk cache
+    # when a fresh copy is available.
+    url = resolve(url)
+    with instrumentation.span('api', 'get_json', url=url) as fields:
+        payload = response_cache.default_cache.get(url)
+        fields['cache_hit'] = payload is not None
+        if payload is None:
+            (status, body, payload), shared = requests_in_flight.run(url, download, url)
+            fields.update(status=status, bytes=len(body), coalesced=shared)
+            payload = json_codec.loads(body) if shared else payload
+    return payload
+
+
+def download(url):
+    # Requests a URL and caches its JSON. Returns the status, body and decoded
+    # JSON of the response, or raises for an error status, so every caller
+    # that shared the request gets the same error. Callers that shared the request
+    # decode the body themselves, so none of them share the JSON.
+    r = get_session().get(url, timeout=request_timeout)
+    r.raise_for_status()
+    payload = json_codec.loads(r.content)
+    response_cache.default_cache.set(url, payload)
+    return r.status_code, r.content, payload
+
+
+async def get_json_async(url, limiter=None, semaphore=None):
+    # Async counterpart of get_json. Must be awaited on the shared loop (see run).
+    # Failed requests are retried with exponential backoff. If a rate limiter is
+    # given, a token is taken from it before every request that goes to the network.
+    # If a semaphore is given, each attempt holds one of its slots while the
+    # request is made, but not while waiting to retry.
+    # The span covers every attempt, including time spent waiting on the limiter.
+    url = resolve(url)
+    with instrumentation.span('api', 'get_json_async', url=url) as fields:
+        payload = response_cache.default_cache.get(url)
+        fields['cache_hit'] = payload is not None
+        if payload is not None:
+            return payload
+
+        (status, body, payload), shared = await requests_in_flight.run_async(url, download_async, url, limiter, semaphore, fields)
+        fields.update(status=status, bytes=len(body), coalesced=shared)
+    return json_codec.loads(body) if shared else payload
+
+
+async def download_async(url, limiter, semaphore, fields):
+    # Async counterpart of download, retrying connection errors, timeouts and
+    # retry_statuses. Other error statuses are raised straight away. The
+    # attempts made and status of the last one are added to fields.
+    session = get_async_session()
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            await limiter.acquire()
+        fields['attempts'] = attempt + 1
+        if semaphore is not None:
+            await semaphore.acquire()
+        try:
+            async with session.get(url) as response:
+                fields['status'] = response.status
+                if response.status not in retry_statuses or attempt == max_retries:
+                    response.raise_for_status()
+                    body = await response.read()
+                    break
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == max_retries:
+                raise
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+        await asyncio.sleep(backoff_factor * 2 ** attempt)
+
+    payload = json_codec.loads(body)
+    response_cache.default_cache.set(url, payload)
+    return response.status, body, payload
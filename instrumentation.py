@@ -0,0 +1,183 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import pandas as pd
+
+# Timing spans for API calls, data_processor transforms, plotter figure builds
+# and page sections, grouped by the page render they happen in. Every render's
+# spans are appended to F1_METRICS_LOG as a JSON line if it is set, and running
+# totals are written to F1_METRICS_PROM_PATH in the Prometheus text format.
+log_path = os.environ.get('F1_METRICS_LOG')
+prometheus_path = os.environ.get('F1_METRICS_PROM_PATH')
+debug_panel = os.environ.get('F1_DEBUG_PANEL', '0') == '1'
+
+current_render = contextvars.ContextVar('current_render', default=None)
+
+_totals = {}
+_api_requests = {}
+_api_bytes = 0
+_renders = {'count': 0, 'seconds': 0.0}
+_lock = threading.Lock()
+
+
+class Render:
+    # The spans recorded while rendering a page once.
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.time()
+        self.duration = None
+        self.spans = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        # Returns a pandas DataFrame with the number of spans, total and longest
+        # time of every stage of the render, slowest first. Spans can be nested
+        # (eg. an API call inside a section), so totals of different kinds overlap.
+        columns = ['kind', 'name', 'count', 'seconds', 'max_seconds']
+        if not self.spans:
+            return pd.DataFrame(columns=columns)
+        spans_df = pd.DataFrame(self.spans)
+        summary_df = spans_df.groupby(['kind', 'name'])['seconds'].agg(['count', 'sum', 'max']).reset_index()
+        summary_df.columns = columns
+        return summary_df.sort_values(by=['seconds'], ascending=False, ignore_index=True)
+
+    def api_calls(self):
+        # Returns a pandas DataFrame of the API calls made during the render.
+        return pd.DataFrame([span for span in self.spans if span['kind'] == 'api'],
+                            columns=['name', 'url', 'cache_hit', 'coalesced', 'status', 'bytes', 'attempts', 'seconds'])
+
+    def to_dict(self):
+        return {'page': self.page, 'started': self.started, 'seconds': self.duration, 'spans': self.spans}
+
+
+def start_render(page):
+    # Starts collecting the spans of a page render in the current context.
+    render = Render(page)
+    current_render.set(render)
+    return render
+
+
+def finish_render(render):
+    # Stops timing a render, adds it to the running totals and exports it.
+    render.duration = time.perf_counter() - render._start
+    current_render.set(None)
+    with _lock:
+        _renders['count'] += 1
+        _renders['seconds'] += render.duration
+    if log_path:
+        with _lock, open(log_path, 'a') as f:
+            f.write(json.dumps(render.to_dict(), default=str) + '\n')
+    if prometheus_path:
+        write_prometheus(prometheus_path)
+    return render
+
+
+def record(kind, name, seconds, fields):
+    # Adds a finished span to the running totals and the current render.
+    global _api_bytes
+    span = dict(fields, kind=kind, name=name, seconds=seconds)
+    with _lock:
+        totals = _totals.setdefault((kind, name), {'count': 0, 'seconds': 0.0})
+        totals['count'] += 1
+        totals['seconds'] += seconds
+        if kind == 'api':
+            key = (str(fields.get('status')), 'hit' if fields.get('cache_hit') else 'miss')
+            _api_requests[key] = _api_requests.get(key, 0) + 1
+            _api_bytes += fields.get('bytes') or 0
+    render = current_render.get()
+    if render is not None:
+        render.add(span)
+
+
+@contextlib.contextmanager
+def span(kind, name, **fields):
+    # Times the body of a with block. Details only known once the block has run
+    # (eg. a response's status) can be added to the yielded dict of fields.
+    start = time.perf_counter()
+    try:
+        yield fields
+    except Exception as e:
+        fields['error'] = type(e).__name__
+        raise
+    finally:
+        record(kind, name, time.perf_counter() - start, fields)
+
+
+def timed(kind):
+    # Decorator recording a span of the given kind, named after the function,
+    # for every call.
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(kind, function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def _in_render(coroutine, render):
+    current_render.set(render)
+    return await coroutine
+
+
+def bind(coroutine):
+    # Wraps a coroutine so the spans it records on another thread's event loop
+    # still go to the render of the calling thread.
+    return _in_render(coroutine, current_render.get())
+
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text():
+    # Returns the running totals as Prometheus-style counters.
+    with _lock:
+        lines = [
+            '# HELP f1_stage_calls_total Calls of each instrumented stage.',
+            '# TYPE f1_stage_calls_total counter',
+        ]
+        lines += ['f1_stage_calls_total{{kind="{}",name="{}"}} {}'.format(label(kind), label(name), totals['count'])
+                  for (kind, name), totals in sorted(_totals.items())]
+        lines += [
+            '# HELP f1_stage_seconds_total Time spent in each instrumented stage.',
+            '# TYPE f1_stage_seconds_total counter',
+        ]
+        lines += ['f1_stage_seconds_total{{kind="{}",name="{}"}} {:.6f}'.format(label(kind), label(name), totals['seconds'])
+                  for (kind, name), totals in sorted(_totals.items())]
+        lines += [
+            '# HELP f1_api_requests_total Ergast API calls by response status and cache result.',
+            '# TYPE f1_api_requests_total counter',
+        ]
+        lines += ['f1_api_requests_total{{status="{}",cache="{}"}} {}'.format(label(status), cache, count)
+                  for (status, cache), count in sorted(_api_requests.items())]
+        lines += [
+            '# HELP f1_api_response_bytes_total Bytes received from the Ergast API.',
+            '# TYPE f1_api_response_bytes_total counter',
+            'f1_api_response_bytes_total {}'.format(_api_bytes),
+            '# HELP f1_renders_total Page renders.',
+            '# TYPE f1_renders_total counter',
+            'f1_renders_total {}'.format(_renders['count']),
+            '# HELP f1_render_seconds_total Time spent rendering pages.',
+            '# TYPE f1_render_seconds_total counter',
+            'f1_render_seconds_total {:.6f}'.format(_renders['seconds']),
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path):
+    # Writes the running totals to a file, eg. for node_exporter's textfile collector.
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(prometheus_text())
+    os.replace(temp_path, path)
@@ -0,0 +1,23 @@
+import json
+
+# Decodes and encodes JSON with orjson when it is installed, which is several
+# times faster than the json module on Ergast's larger responses, and falls
+# back to the json module otherwise.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data):
+    # Decodes JSON from a str or bytes.
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    # Encodes an object as compact JSON text.
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(',', ':'))
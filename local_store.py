@@ -0,0 +1,356 @@
+import argparse
+import functools
+import os
+import pandas as pd
+
+# Set F1_DATA_BACKEND=local to answer ergastpy and data_scraper queries from a
+# store built with `python local_store.py ingest <dump dir>` instead of the API.
+backend = os.environ.get('F1_DATA_BACKEND', 'api')
+store_path = os.environ.get('F1_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ergast'))
+
+required_tables = ['races', 'results', 'driver_standings', 'constructor_standings', 'drivers', 'constructors', 'circuits']
+optional_tables = ['qualifying', 'status', 'sprint_results']
+
+
+def enabled():
+    # Returns True if queries should be answered from the local store.
+    return backend == 'local'
+
+
+def ingest(dump_dir, target=None):
+    # Loads the CSV files of an Ergast database dump into the local store,
+    # writing one Parquet file per table.
+    target = target or store_path
+    os.makedirs(target, exist_ok=True)
+    for table in required_tables + optional_tables:
+        csv_path = os.path.join(dump_dir, table + '.csv')
+        if not os.path.exists(csv_path):
+            assert table not in required_tables, 'Missing {} in the database dump'.format(table + '.csv')
+            continue
+        df = pd.read_csv(csv_path, na_values=['\\N'], keep_default_na=False)
+        df.to_parquet(os.path.join(target, table + '.parquet'), index=False)
+    load_table.cache_clear()
+
+
+@functools.lru_cache(maxsize=None)
+def load_table(table):
+    # Reads a table of the local store, keeping it in memory for later queries.
+    path = os.path.join(store_path, table + '.parquet')
+    assert os.path.exists(path), 'Local store has no {} table. Run `python local_store.py ingest <dump dir>` first.'.format(table)
+    return pd.read_parquet(path)
+
+
+def has_table(table):
+    return os.path.exists(os.path.join(store_path, table + '.parquet'))
+
+
+def latest_season():
+    # Returns the most recent season with race results in the store.
+    races = load_table('races')
+    return int(races.loc[races['raceId'].isin(load_table('results')['raceId']), 'year'].max())
+
+
+def get_race_id(year, race):
+    # Returns the store's internal raceId of a given round of a season.
+    races = load_table('races')
+    race_id = races.loc[(races['year'] == year) & (races['round'] == race), 'raceId']
+    assert len(race_id) > 0, 'No race {} in {}'.format(race, year)
+    return int(race_id.iloc[0])
+
+
+def get_last_round(year, table):
+    # Returns the last round of a season that has entries in the given table.
+    races = load_table('races')
+    rounds = races.loc[(races['year'] == year) & races['raceId'].isin(load_table(table)['raceId']), 'round']
+    if len(rounds) == 0:
+        raise IndexError('No {} in the local store for {}'.format(table, year))
+    return int(rounds.max())
+
+
+def get_season_race_ids(year, race=None):
+    # Returns the raceIds of every race in a season, or of a single round.
+    races = load_table('races')
+    season = races.loc[races['year'] == year]
+    if race:
+        season = season.loc[season['round'] == race]
+    return season['raceId']
+
+
+def full_name(df):
+    return df['forename'] + ' ' + df['surname']
+
+
+def format_drivers(drivers):
+    # Reformats rows of the drivers table into the shape returned by ergastpy.get_drivers.
+    return pd.DataFrame({
+        'driverId': drivers['driverRef'].values,
+        'permanentNumber': drivers['number'].values,
+        'code': drivers['code'].values,
+        'url': drivers['url'].values,
+        'givenName': drivers['forename'].values,
+        'familyName': drivers['surname'].values,
+        'dateOfBirth': drivers['dob'].values,
+        'nationality': drivers['nationality'].values,
+    })
+
+
+def get_drivers(year=None, race=None):
+    drivers = load_table('drivers')
+    if year:
+        results = load_table('results')
+        ids = results.loc[results['raceId'].isin(get_season_race_ids(year, race)), 'driverId']
+        drivers = drivers.loc[drivers['driverId'].isin(ids)]
+    return format_drivers(drivers.sort_values(by=['driverRef'])).reset_index(drop=True)
+
+
+def get_constructors(year=None, race=None):
+    constructors = load_table('constructors')
+    if year:
+        results = load_table('results')
+        ids = results.loc[results['raceId'].isin(get_season_race_ids(year, race)), 'constructorId']
+        constructors = constructors.loc[constructors['constructorId'].isin(ids)]
+    constructors = constructors.sort_values(by=['constructorRef'])
+    return pd.DataFrame({
+        'constructorId': constructors['constructorRef'].values,
+        'url': constructors['url'].values,
+        'name': constructors['name'].values,
+        'nationality': constructors['nationality'].values,
+    })
+
+
+def get_circuits(year=None, race=None):
+    circuits = load_table('circuits')
+    if year:
+        races = load_table('races')
+        ids = races.loc[races['raceId'].isin(get_season_race_ids(year, race)), 'circuitId']
+        circuits = circuits.loc[circuits['circuitId'].isin(ids)]
+    circuits = circuits.sort_values(by=['circuitRef'])
+    return pd.DataFrame({
+        'circuitId': circuits['circuitRef'].values,
+        'url': circuits['url'].values,
+        'circuitName': circuits['name'].values,
+        'Latitude': circuits['lat'].values,
+        'Longtitude': circuits['lng'].values,
+        'Locality': circuits['location'].values,
+        'Country': circuits['country'].values,
+    })
+
+
+def get_schedule(year=None):
+    year = year or latest_season()
+    races = load_table('races')
+    season = races.loc[races['year'] == year].sort_values(by=['round'])
+    season = season.merge(load_table('circuits'), on='circuitId', how='left', suffixes=('', '_circuit'))
+    return pd.DataFrame({
+        'season': season['year'].values.astype('int16'),
+        'round': season['round'].values.astype('int16'),
+        'url': season['url'].values,
+        'raceName': season['name'].values,
+        'date': pd.to_datetime(season['date']).values,
+        'time': season['time'].values if 'time' in season else None,
+        'circuitID': season['circuitRef'].values,
+        'circuitName': season['name_circuit'].values,
+        'locality': season['location'].values,
+        'country': season['country'].values,
+    })
+
+
+def join_competitors(df):
+    # Adds the driver and constructor details to a table with driverId and
+    # constructorId columns.
+    drivers = load_table('drivers')[['driverId', 'driverRef', 'forename', 'surname', 'nationality']]
+    constructors = load_table('constructors')[['constructorId', 'constructorRef', 'name']]
+    df = df.merge(drivers, on='driverId', how='left').merge(constructors, on='constructorId', how='left')
+    df['driverID'] = df['driverRef']
+    df['driver'] = full_name(df)
+    df['constructorID'] = df['constructorRef']
+    df['constructor'] = df['name']
+    return df
+
+
+def get_race_result(year=None, race=None):
+    if not (year and race):
+        year = latest_season()
+        race = get_last_round(year, 'results')
+    results = load_table('results')
+    results = results.loc[results['raceId'] == get_race_id(year, race)].sort_values(by=['positionOrder'])
+    results = join_competitors(results)
+
+    if has_table('status'):
+        results = results.merge(load_table('status'), on='statusId', how='left')
+    else:
+        results['status'] = results['statusId']
+    results['Time'] = [
+        {'millis': str(int(millis)), 'time': time} if pd.notna(millis) else float('nan')
+        for millis, time in zip(results['milliseconds'], results['time'])
+    ]
+
+    cols = ['number', 'position', 'positionText', 'grid', 'points', 'driverID', 'driver',
+            'nationality', 'constructorID', 'constructor', 'laps', 'status', 'Time']
+    return results[cols].reset_index(drop=True)
+
+
+def get_qualifying_result(year=None, race=None):
+    if not (year and race):
+        year = latest_season()
+        race = get_last_round(year, 'qualifying')
+    qualifying = load_table('qualifying')
+    qualifying = qualifying.loc[qualifying['raceId'] == get_race_id(year, race)].sort_values(by=['position'])
+    qualifying = join_competitors(qualifying).rename(columns={'q1': 'Q1', 'q2': 'Q2', 'q3': 'Q3'})
+
+    cols = ['number', 'position', 'driverID', 'driver', 'nationality', 'constructorID', 'constructor', 'Q1']
+    for session in ['Q2', 'Q3']:
+        if qualifying[session].notna().any():
+            cols.append(session)
+    return qualifying[cols].reset_index(drop=True)
+
+
+def get_driver_standings(year, race):
+    # Returns the driver standings after a round of a season, with the
+    # constructor each driver most recently raced for.
+    standings = load_table('driver_standings')
+    standings = standings.loc[standings['raceId'] == get_race_id(year, race)].sort_values(by=['position'])
+
+    races = load_table('races')
+    results = load_table('results')
+    season_ids = races.loc[(races['year'] == year) & (races['round'] <= race), ['raceId', 'round']]
+    teams = results.merge(season_ids, on='raceId').sort_values(by=['round'])
+    teams = teams.drop_duplicates(subset=['driverId'], keep='last')[['driverId', 'constructorId']]
+
+    standings = join_competitors(standings.merge(teams, on='driverId', how='left'))
+    return pd.DataFrame({
+        'position': standings['position'].values,
+        'positionText': standings['positionText'].values,
+        'points': standings['points'].values,
+        'wins': standings['wins'].values,
+        'driverID': standings['driverID'].values,
+        'driver': standings['driver'].values,
+        'nationality': standings['nationality'].values,
+        'constructorID': standings['constructorID'].values,
+        'constructor': standings['constructor'].values,
+    })
+
+
+def get_constructor_standings(year, race):
+    # Returns the constructor standings after a round of a season.
+    standings = load_table('constructor_standings')
+    standings = standings.loc[standings['raceId'] == get_race_id(year, race)].sort_values(by=['position'])
+    standings = standings.merge(load_table('constructors'), on='constructorId', how='left')
+    return pd.DataFrame({
+        'position': standings['position'].values,
+        'positionText': standings['positionText'].values,
+        'points': standings['points'].values,
+        'wins': standings['wins'].values,
+        'constructorID': standings['constructorRef'].values,
+        'name': standings['name'].values,
+        'nationality': standings['nationality'].values,
+    })
+
+
+def driver_standings(year=None, race=None):
+    year = year or latest_season()
+    return get_driver_standings(year, race or get_last_round(year, 'driver_standings'))
+
+
+def constructor_standings(year=None, race=None):
+    year = year or latest_season()
+    return get_constructor_standings(year, race or get_last_round(year, 'constructor_standings'))
+
+
+def get_final_standings(table):
+    # Returns the standings at the end of every season in the given standings table.
+    races = load_table('races')
+    standings = load_table(table).merge(races[['raceId', 'year', 'round']], on='raceId')
+    last_rounds = standings.groupby('year')['round'].transform('max')
+    return standings.loc[standings['round'] == last_rounds]
+
+
+def query_driver(driverid):
+    drivers = load_table('drivers')
+    driver_id = drivers.loc[drivers['driverRef'] == driverid, 'driverId']
+    seasons = get_final_standings('driver_standings')
+    seasons = seasons.loc[seasons['driverId'].isin(driver_id)].sort_values(by=['year'])
+    return pd.concat(
+        [get_driver_standings(year, race).loc[lambda df: df['driverID'] == driverid].assign(season=year, round=race)
+         for year, race in zip(seasons['year'], seasons['round'])],
+        ignore_index=True
+    )[['season', 'round', 'position', 'positionText', 'points', 'wins', 'driver', 'nationality', 'constructorID', 'constructor']]
+
+
+def query_constructor(constructorid):
+    constructors = load_table('constructors')
+    constructor = constructors.loc[constructors['constructorRef'] == constructorid]
+    seasons = get_final_standings('constructor_standings')
+    seasons = seasons.loc[seasons['constructorId'].isin(constructor['constructorId'])].sort_values(by=['year'])
+    seasons = seasons.merge(constructor, on='constructorId')
+    return pd.DataFrame({
+        'season': seasons['year'].values,
+        'round': seasons['round'].values,
+        'position': seasons['position'].values,
+        'positionText': seasons['positionText'].values,
+        'points': seasons['points'].values,
+        'wins': seasons['wins'].values,
+        'constructorID': seasons['constructorRef'].values,
+        'constructor': seasons['name'].values,
+        'nationality': seasons['nationality'].values,
+    })
+
+
+def get_race_results(table='results'):
+    # Returns every race result in the store in the shape of
+    # data_processor.make_race_results_df. The table is 'results', or
+    # 'sprint_results' for the sprints, which older dumps don't have.
+    if not has_table(table):
+        return pd.DataFrame(columns=['season', 'race', 'driverID', 'constructorID', 'position', 'grid', 'points'])
+    races = load_table('races')[['raceId', 'year', 'round']]
+    results = join_competitors(load_table(table).merge(races, on='raceId'))
+    return pd.DataFrame({
+        'season': results['year'].values,
+        'race': results['round'].values,
+        'driverID': results['driverID'].values,
+        'constructorID': results['constructorID'].values,
+        'position': results['positionOrder'].values,
+        'grid': results['grid'].values,
+        'points': results['points'].values.astype(float),
+    })
+
+
+def get_races(season_length, competitor_type, year):
+    # Local counterpart of data_scraper.get_races: a dict of race index -> standings,
+    # where index 0 holds the standings after the last race of the season.
+    races = {}
+    for race in range(0, season_length):
+        round = race or season_length
+        if (competitor_type == 'driver'):
+            races[race] = get_driver_standings(year, round)
+        else:
+            if not (load_table('constructor_standings')['raceId'] == get_race_id(year, round)).any():
+                raise IndexError('No constructor standings in the local store for {} round {}'.format(year, round))
+            races[race] = get_constructor_standings(year, round)
+    return races
+
+
+def get_champ_wins(competitor_type):
+    # Local counterpart of data_scraper.get_champ_winners: a list of [ID, number of
+    # championships won] for every champion.
+    if (competitor_type == 'driver'):
+        champions = get_final_standings('driver_standings')
+        champions = champions.loc[champions['position'] == 1].merge(load_table('drivers'), on='driverId')
+        counts = champions.groupby('driverRef').size()
+    else:
+        champions = get_final_standings('constructor_standings')
+        champions = champions.loc[champions['position'] == 1].merge(load_table('constructors'), on='constructorId')
+        counts = champions.groupby('constructorRef').size()
+    return [[competitor, int(wins)] for competitor, wins in counts.items()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the local store of Ergast data.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help='Load the CSV files of an Ergast database dump.')
+    ingest_parser.add_argument('dump_dir', help='Directory containing the extracted CSV files.')
+    ingest_parser.add_argument('--store', default=store_path, help='Directory to write the store to.')
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        ingest(args.dump_dir, args.store)
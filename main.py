@@ -3,99 +3,81 @@ import ergastpy
 import data_scraper
 import data_processor
 import plotter
-import time
+import season_store
+import instrumentation
 
-start = time.time()
+render = instrumentation.start_render('main')
 
 st.set_page_config(layout="wide", page_title='F1 Data Visualizer', page_icon='favicon.ico')
 
+# Sections of the page, in the order they are shown
+section_names = ['Points Progression', 'Standings', 'All-Time Rankings']
 
-def get_non_selected_competitors(df, competitorID, competitor):
+
+def get_selected_competitors(df, competitorID, competitor):
     # Presents a Streamlit Multiselectbox to the user to determine which options
-    # to include. Those excluded are returned.
+    # to include. The set of those included is returned.
     competitor_list = data_processor.get_column_list(df, competitorID)
     selected_competitors = st.multiselect('Choose ' + competitor, options=competitor_list, default=competitor_list)
-    return list(set(competitor_list) - set(selected_competitors))
+    return set(selected_competitors)
 
 
 # Get season schedule, drivers and constructors
 @st.cache(suppress_st_warning=True, allow_output_mutation=True)
 def make_api_calls(year):
     # Makes initial calls to Ergast API to retrieve data that will is necessary
-    # to begin the visualizations.
-    schedule = ergastpy.get_schedule(year)
-    driver_df = ergastpy.get_drivers(year)
-    constructor_df = ergastpy.get_constructors(year)
-    return schedule, driver_df, constructor_df
-
-
-# Set up sections of web page
-header = st.beta_container()
-points_progression_section = st.beta_container()
-driver_points_progression_column, constructor_points_progression_column = st.beta_columns(2)
-standings_section = st.beta_container()
-driver_standings_column, constructor_standings_column = st.beta_columns(2)
-champs_ranking_section = st.beta_container()
-
-with header:
-    st.title('Formula 1 Data Visualiser')
-    st.markdown('An [open-source](https://github.com/adenhaus/f1-data-viz) project by [**Aden Haussmann**](https://www.linkedin.com/in/aden-haussmann/).')
-    st.markdown('Explore detailed F1 data such as how driver and constructor points progressed over a given season, current and historical standings, career snapshots and more key stats.')
-    st.markdown('*Control the input parameters of tables and visualizations below by using the tools with matching headings in the sidebar to the left.*')
-    st.markdown('***Hint:*** *Hover over lines, bars or other aspects of a chart to see more details.*')
-
-with st.sidebar:
-    st.markdown('# **Adjust Parameters**')
-
-    year = st.slider('Choose Year', min_value=1950, max_value=2021, value=2021, step=1)
-    schedule, driver_df, constructor_df = make_api_calls(year)
-
-    # Restrict schedule to races which have already taken place
-    schedule = data_processor.make_column_past_dates(schedule, 'date')
-    season_length = len(schedule)
-
-    st.markdown('---')
-    st.markdown('## **Points Progression**')
-
-    with st.beta_expander("Select Drivers"):
-        non_selected_drivers = get_non_selected_competitors(driver_df, 'driverId', 'Drivers')
-
-    with st.beta_expander("Select Constructors"):
-        non_selected_constructors = get_non_selected_competitors(constructor_df, 'constructorId', 'Constructors')
-
-    show_legend = st.checkbox('Show legends', help='Legends are hidden by default as they cramp the layout somewhat, but you can enable them.')
-    st.markdown('---')
+    # to begin the visualizations. Sessions opening the same season at the same
+    # time share the calls.
+    return data_scraper.season_flights.do(('season', year), fetch_season, year)
 
-    st.markdown('## **Standings**')
 
-    # Choose race
-    race_list = data_processor.get_column_list(schedule, 'raceName')
-    race_list.reverse()
-    race = st.selectbox('Choose Race', options=race_list)
-    round = data_processor.get_race_round(schedule, 'raceName', race)
+def fetch_season(year):
+    # Fetches the schedule, drivers and constructors of a season.
+    schedule = season_store.read_or_fetch('schedule', year, lambda: ergastpy.get_schedule(year))
+    driver_df = season_store.read_or_fetch('drivers', year, lambda: ergastpy.get_drivers(year))
+    constructor_df = season_store.read_or_fetch('constructors', year, lambda: ergastpy.get_constructors(year))
+    return schedule, driver_df, constructor_df
 
 
-with points_progression_section:
+@st.cache(suppress_st_warning=True, allow_output_mutation=True)
+def get_schedule(year):
+    # Fetches only the schedule of a season, without its drivers and constructors.
+    return season_store.read_or_fetch('schedule', year, lambda: ergastpy.get_schedule(year))
+
+
+def get_latest_season():
+    # Returns the current season once its first race has taken place, and the
+    # previous one before that or if the current schedule can't be fetched.
+    try:
+        schedule = get_schedule(data_scraper.current_year)
+    except Exception:
+        return data_scraper.current_year - 1
+    if len(data_processor.make_column_past_dates(schedule.copy(), 'date')):
+        return data_scraper.current_year
+    return data_scraper.current_year - 1
+
+
+def show_points_progression(year, season_length, results_round, driver_df, constructor_df, selected_drivers, selected_constructors, show_legend):
+    # Line charts of the points progression of the selected drivers/constructors
+    # over a season, and pie charts of the share of points they scored.
     st.markdown('---')
     st.markdown('## **Points Progression**')
     st.markdown('Compare any combination of drivers or constructors by selecting them in the sidebar on the left to see their points progression over the course of a given season, which you can also choose on the left.')
+    driver_points_progression_column, constructor_points_progression_column = st.beta_columns(2)
 
     with driver_points_progression_column:
         st.markdown('### **Drivers**')
 
         # Get dataframe with all drivers' points for each race in the season
-        all_driver_points_df = data_scraper.get_points(year, 'driver', season_length, driver_df)
-        selected_driver_points_df = all_driver_points_df.copy()
+        all_driver_points_df = data_scraper.get_points(year, 'driver', season_length, driver_df, results_round)
 
-        # Remove drivers who weren't selected
-        selected_driver_points_df = data_processor.remove_df_rows(selected_driver_points_df, 'driverID', non_selected_drivers)
+        # Keep only the selected drivers
+        selected_driver_points_df = data_processor.filter_competitors(all_driver_points_df, 'driverID', keep=selected_drivers)
 
-        driver_standings_fig = plotter.draw_viridis_line_chart(selected_driver_points_df, "race", "points", 'driverID', 'driverID', 'driverID', 'Race', 'Points', 'Drivers')
+        driver_standings_fig = plotter.draw_line_chart(selected_driver_points_df, "race", "points", 'driverID', 'driverID', 'driverID', 'Race', 'Points', 'Drivers',
+                                                       'viridis', show_legend, key=('driver_points', year, frozenset(selected_drivers)))
         points_scoring_drivers = data_processor.get_points_scoring_competitors(all_driver_points_df, season_length)
-        driver_standings_pie = plotter.draw_viridis_pie_chart(points_scoring_drivers, 'points', 'driverID')
-
-        if (show_legend):
-            driver_standings_fig, driver_standings_pie = plotter.turn_on_driver_legends(driver_standings_fig, driver_standings_pie)
+        driver_standings_pie = plotter.draw_pie_chart(points_scoring_drivers, 'points', 'driverID', 'viridis', show_legend, key=('driver_points_share', year))
 
         st.plotly_chart(driver_standings_fig, use_container_width=True)
         st.plotly_chart(driver_standings_pie, use_container_width=True)
@@ -106,61 +88,137 @@ with points_progression_section:
         # Try except block necessary because constructor standings data is not available before 1958
         try:
             # Get dataframe with all drivers' points for each race in the season
-            all_constructor_points_df = data_scraper.get_points(year, 'constructor', season_length, constructor_df)
-            selected_constructor_points_df = all_constructor_points_df.copy()
-            # Remove constructors who didn't score any points
-            selected_constructor_points_df = data_processor.remove_df_rows(selected_constructor_points_df, 'constructorID', non_selected_constructors)
+            all_constructor_points_df = data_scraper.get_points(year, 'constructor', season_length, constructor_df, results_round)
+            # Keep only the selected constructors
+            selected_constructor_points_df = data_processor.filter_competitors(all_constructor_points_df, 'constructorID', keep=selected_constructors)
         except IndexError:
-            pass
+            st.write('*No constructor standings data available for seasons before 1958.*')
+            return
 
-        try:
-            constructor_standings_fig = plotter.draw_sunsetdark_line_chart(selected_constructor_points_df, "race", "points", 'constructorID', 'constructorID', 'constructorID', 'Race', 'Points', 'Constructors')
-            points_scoring_constructors = data_processor.get_points_scoring_competitors(all_constructor_points_df, season_length)
-            constructor_standings_pie = plotter.draw_sunsetdark_pie_chart(points_scoring_constructors, 'points', 'constructorID')
+        constructor_standings_fig = plotter.draw_line_chart(selected_constructor_points_df, "race", "points", 'constructorID', 'constructorID', 'constructorID', 'Race', 'Points', 'Constructors',
+                                                            'sunsetdark', show_legend, key=('constructor_points', year, frozenset(selected_constructors)))
+        points_scoring_constructors = data_processor.get_points_scoring_competitors(all_constructor_points_df, season_length)
+        constructor_standings_pie = plotter.draw_pie_chart(points_scoring_constructors, 'points', 'constructorID', 'sunsetdark', show_legend, key=('constructor_points_share', year))
 
-            if (show_legend):
-                constructor_standings_fig, constructor_standings_pie = plotter.turn_on_constructor_legends(constructor_standings_fig, constructor_standings_pie)
+        st.plotly_chart(constructor_standings_fig, use_container_width=True)
+        st.plotly_chart(constructor_standings_pie, use_container_width=True)
 
-            st.plotly_chart(constructor_standings_fig, use_container_width=True)
-            st.plotly_chart(constructor_standings_pie, use_container_width=True)
-        except NameError:
-            st.write('*No constructor standings data available for seasons before 1958.*')
 
-with standings_section:
+def show_standings(year, season_length, results_round, driver_df, constructor_df, round):
+    # Tables of the driver and constructor standings after a race.
     st.markdown('---')
     st.markdown('## **Standings**')
     st.markdown('Choose a year and a race from the sidebar on the left to view driver and constructors standings.')
+    driver_standings_column, constructor_standings_column = st.beta_columns(2)
 
     with driver_standings_column:
         st.markdown('### **Drivers Championship**')
-        driver_standings_df = data_processor.get_standings(all_driver_points_df, round)
+        driver_standings_index = data_scraper.get_standings_index(year, 'driver', season_length, driver_df, results_round)
+        driver_standings_df = data_processor.get_round_standings(driver_standings_index, round)
         st.dataframe(driver_standings_df)
 
     with constructor_standings_column:
         st.markdown('### **Constructors Championship**')
         # Try except block necessary because constructor standings data is not available before 1958
         try:
-            constructor_standings_df = data_processor.get_standings(all_constructor_points_df, round)
+            constructor_standings_index = data_scraper.get_standings_index(year, 'constructor', season_length, constructor_df, results_round)
+            constructor_standings_df = data_processor.get_round_standings(constructor_standings_index, round)
             st.dataframe(constructor_standings_df)
-        except NameError:
+        except IndexError:
             st.write('*No constructor standings data available for seasons before 1958.*')
 
-with champs_ranking_section:
+
+def show_champs_ranking(champ_winners):
+    # Bar charts of the championships won by every driver and constructor. The
+    # data is fetched in the background while the rest of the page renders, so
+    # this only waits for whatever is left of the fetch.
     st.markdown('---')
     st.markdown('## **All-Time Rankings**')
     st.markdown('Drivers and constructors ranked their total respective Championship victoroies.')
 
-    driver_champs_df = data_scraper.get_champ_winners('driver')
+    with st.spinner('Loading all-time rankings...'):
+        driver_champs_df = champ_winners['driver'].result()
+        constructor_champs_df = champ_winners['constructor'].result()
+
     driver_champs_df = data_processor.df_column_to_int(driver_champs_df, 'number_wins')
-    driver_champs_fig = plotter.draw_viridis_bar_chart(driver_champs_df, 'driverID', 'number_wins', 'Driver', 'Championships Won', 'driverID')
+    driver_champs_fig = plotter.draw_bar_chart(driver_champs_df, 'driverID', 'number_wins', 'Driver', 'Championships Won', 'driverID', 'viridis', key='driver_champs')
     st.plotly_chart(driver_champs_fig, use_container_width=True)
 
-    constructor_champs_df = data_scraper.get_champ_winners('constructor')
     constructor_champs_df = data_processor.df_column_to_int(constructor_champs_df, 'number_wins')
-    constructor_champs_fig = plotter.draw_sunsetdark_bar_chart(constructor_champs_df, 'constructorID', 'number_wins', 'Constructor', 'Championships Won', 'constructorID')
+    constructor_champs_fig = plotter.draw_bar_chart(constructor_champs_df, 'constructorID', 'number_wins', 'Constructor', 'Championships Won', 'constructorID', 'sunsetdark', key='constructor_champs')
     st.plotly_chart(constructor_champs_fig, use_container_width=True)
 
-end = time.time()
-print("TOTAL TIME:")
-print(end - start)
-print()
+
+with st.beta_container(), instrumentation.span('section', 'header'):
+    st.title('Formula 1 Data Visualiser')
+    st.markdown('An [open-source](https://github.com/adenhaus/f1-data-viz) project by [**Aden Haussmann**](https://www.linkedin.com/in/aden-haussmann/).')
+    st.markdown('Explore detailed F1 data such as how driver and constructor points progressed over a given season, current and historical standings, career snapshots and more key stats.')
+    st.markdown('*Control the input parameters of tables and visualizations below by using the tools with matching headings in the sidebar to the left.*')
+    st.markdown('***Hint:*** *Hover over lines, bars or other aspects of a chart to see more details.*')
+
+with st.sidebar, instrumentation.span('section', 'sidebar'):
+    st.markdown('# **Adjust Parameters**')
+
+    # Only the chosen sections are computed, along with their controls below
+    sections = st.multiselect('Show Sections', options=section_names, default=section_names)
+
+    # Start fetching the all-time rankings, which don't depend on any of the
+    # controls, before the season's data so the two overlap
+    if 'All-Time Rankings' in sections:
+        champ_winners = {competitor_type: data_scraper.get_champ_winners_in_background(competitor_type)
+                         for competitor_type in ['driver', 'constructor']}
+
+    # The current season can be chosen once its first race has taken place
+    latest_season = get_latest_season()
+    year = st.slider('Choose Year', min_value=1950, max_value=latest_season, value=latest_season, step=1)
+    schedule, driver_df, constructor_df = make_api_calls(year)
+
+    # Restrict schedule to races which have already taken place
+    schedule = data_processor.make_column_past_dates(schedule, 'date')
+    season_length = len(schedule)
+    results_round = data_scraper.get_results_round(year)
+
+    if 'Points Progression' in sections:
+        st.markdown('---')
+        st.markdown('## **Points Progression**')
+
+        with st.beta_expander("Select Drivers"):
+            selected_drivers = get_selected_competitors(driver_df, 'driverId', 'Drivers')
+
+        with st.beta_expander("Select Constructors"):
+            selected_constructors = get_selected_competitors(constructor_df, 'constructorId', 'Constructors')
+
+        show_legend = st.checkbox('Show legends', help='Legends are hidden by default as they cramp the layout somewhat, but you can enable them.')
+
+    if 'Standings' in sections:
+        st.markdown('---')
+        st.markdown('## **Standings**')
+
+        # Choose race
+        race_list = data_processor.get_column_list(schedule, 'raceName')
+        race_list.reverse()
+        race = st.selectbox('Choose Race', options=race_list)
+        round = data_processor.get_race_round(schedule, 'raceName', race)
+
+
+if 'Points Progression' in sections:
+    with instrumentation.span('section', 'points_progression'):
+        show_points_progression(year, season_length, results_round, driver_df, constructor_df, selected_drivers, selected_constructors, show_legend)
+
+if 'Standings' in sections:
+    with instrumentation.span('section', 'standings'):
+        show_standings(year, season_length, results_round, driver_df, constructor_df, round)
+
+if 'All-Time Rankings' in sections:
+    with instrumentation.span('section', 'champs_ranking'):
+        show_champs_ranking(champ_winners)
+
+instrumentation.finish_render(render)
+
+# Show where the time went in this render, enabled with F1_DEBUG_PANEL=1
+if instrumentation.debug_panel:
+    with st.beta_expander('Debug: render timings'):
+        st.markdown('Rendered in **{:.3f}s**'.format(render.duration))
+        st.dataframe(render.summary())
+        st.dataframe(render.api_calls())
+        st.code(instrumentation.prometheus_text())
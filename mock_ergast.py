@@ -0,0 +1,451 @@
+import argparse
+import http.server
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+import pandas as pd
+import requests
+import local_store
+
+# A local stand-in for the Ergast API. It answers the URL shapes used by
+# ergastpy and data_scraper from recorded fixtures or from the local store
+# built by `python local_store.py ingest`, and can inject latency, errors and
+# rate limiting so the fetch path can be load tested deterministically.
+api_path = '/api/f1/'
+nested_tables = {
+    'results': ('results', 'Results'),
+    'sprint': ('sprint_results', 'SprintResults'),
+    'qualifying': ('qualifying', 'QualifyingResults'),
+}
+
+
+def fixture_name(path):
+    # Maps the part of a request path after /api/f1/ (including the query
+    # string) to a fixture file name.
+    return urllib.parse.quote(path, safe='') + '.json'
+
+
+def parse_path(path):
+    # Splits an API path such as '2021/5/driverStandings.json' into the season,
+    # round, filters (eg. {'drivers': 'hamilton'}) and the resource requested.
+    segments = [segment for segment in path.split('.json')[0].split('/') if segment]
+    query = {'season': None, 'round': None, 'filters': {}, 'resource': None}
+    if segments and (segments[0].isdigit() or segments[0] == 'current'):
+        query['season'] = segments.pop(0)
+        if segments and (segments[0].isdigit() or segments[0] == 'last'):
+            query['round'] = segments.pop(0)
+    while len(segments) >= 2:
+        query['filters'][segments[0]] = segments[1]
+        segments = segments[2:]
+    if segments:
+        query['resource'] = segments[0]
+    elif query['filters']:
+        # A path ending in a filter (eg. 'driverStandings/1' or 'drivers/hamilton')
+        # asks for that resource itself
+        query['resource'] = list(query['filters'])[-1]
+    return query
+
+
+def text(value):
+    # Formats a value the way Ergast does, as a string without a trailing '.0'.
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def prefixed(table, prefix, key):
+    # Loads a table of the local store with every column but its key prefixed,
+    # so it can be joined onto other tables without name clashes.
+    df = local_store.load_table(table)
+    return df.rename(columns={column: prefix + column for column in df.columns if column != key})
+
+
+def driver_json(row):
+    driver = {
+        'driverId': row['driver_driverRef'],
+        'url': row['driver_url'],
+        'givenName': row['driver_forename'],
+        'familyName': row['driver_surname'],
+        'dateOfBirth': row['driver_dob'],
+        'nationality': row['driver_nationality'],
+    }
+    if pd.notna(row['driver_number']):
+        driver['permanentNumber'] = text(row['driver_number'])
+    if pd.notna(row['driver_code']):
+        driver['code'] = row['driver_code']
+    return driver
+
+
+def constructor_json(row):
+    return {
+        'constructorId': row['constructor_constructorRef'],
+        'url': row['constructor_url'],
+        'name': row['constructor_name'],
+        'nationality': row['constructor_nationality'],
+    }
+
+
+def circuit_json(row):
+    return {
+        'circuitId': row['circuit_circuitRef'],
+        'url': row['circuit_url'],
+        'circuitName': row['circuit_name'],
+        'Location': {
+            'lat': text(row['circuit_lat']),
+            'long': text(row['circuit_lng']),
+            'locality': row['circuit_location'],
+            'country': row['circuit_country'],
+        },
+    }
+
+
+def race_json(row):
+    race = {
+        'season': text(row['year']),
+        'round': text(row['round']),
+        'url': row['url'],
+        'raceName': row['name'],
+        'Circuit': circuit_json(row),
+        'date': row['date'],
+    }
+    if 'time' in row and pd.notna(row['time']):
+        race['time'] = row['time'] + 'Z'
+    return race
+
+
+def result_json(row):
+    result = {
+        'number': text(row['number']),
+        'position': text(row['positionOrder']),
+        'positionText': text(row['positionText']),
+        'points': text(row['points']),
+        'Driver': driver_json(row),
+        'Constructor': constructor_json(row),
+        'grid': text(row['grid']),
+        'laps': text(row['laps']),
+        'status': row['status'],
+    }
+    if pd.notna(row['milliseconds']):
+        result['Time'] = {'millis': text(row['milliseconds']), 'time': row['time']}
+    return result
+
+
+def qualifying_json(row):
+    result = {
+        'number': text(row['number']),
+        'position': text(row['position']),
+        'Driver': driver_json(row),
+        'Constructor': constructor_json(row),
+    }
+    for session in ['q1', 'q2', 'q3']:
+        if pd.notna(row[session]):
+            result[session.upper()] = row[session]
+    return result
+
+
+def standing_json(row):
+    return {
+        'position': text(row['position']),
+        'positionText': text(row['positionText']),
+        'points': text(row['points']),
+        'wins': text(row['wins']),
+    }
+
+
+def paginate(groups, key, limit, offset):
+    # Pages through nested lists the way Ergast does: limit and offset count
+    # the innermost entries (eg. results), and each group (eg. race) appears in
+    # the page with just its entries that fall within it.
+    page = []
+    total = 0
+    for group in groups:
+        entries = group[key]
+        start = max(offset - total, 0)
+        end = min(offset + limit - total, len(entries))
+        if start < end:
+            page.append(dict(group, **{key: entries[start:end]}))
+        total += len(entries)
+    return page, total
+
+
+class DumpSource:
+    # Builds Ergast responses from the tables of the local store.
+
+    def season(self, query):
+        if query['season'] == 'current':
+            return local_store.latest_season()
+        return int(query['season'])
+
+    def races(self, query):
+        # Returns the races matching the season and round of a query, with
+        # their circuits. Round 0 is treated as the whole season.
+        races = local_store.load_table('races').merge(prefixed('circuits', 'circuit_', 'circuitId'), on='circuitId')
+        if query['season']:
+            season = self.season(query)
+            races = races.loc[races['year'] == season]
+            if query['round'] == 'last':
+                table = nested_tables.get(query['resource'], ('results',))[0]
+                races = races.loc[races['round'] == local_store.get_last_round(season, table)]
+            elif query['round'] not in (None, '0'):
+                races = races.loc[races['round'] == int(query['round'])]
+        return races.sort_values(by=['year', 'round'])
+
+    def with_competitors(self, df, query):
+        # Joins the drivers and constructors onto a table and applies the
+        # query's driver and constructor filters.
+        if 'driverId' in df:
+            df = df.merge(prefixed('drivers', 'driver_', 'driverId'), on='driverId')
+            if 'drivers' in query['filters']:
+                df = df.loc[df['driver_driverRef'] == query['filters']['drivers']]
+        if 'constructorId' in df:
+            df = df.merge(prefixed('constructors', 'constructor_', 'constructorId'), on='constructorId')
+            if 'constructors' in query['filters']:
+                df = df.loc[df['constructor_constructorRef'] == query['filters']['constructors']]
+        return df
+
+    def race_table(self, query):
+        # Returns the races of a schedule query, or of a results, sprint or
+        # qualifying query with each race's list of entries, and the key of
+        # that list.
+        races = self.races(query)
+        if query['resource'] not in nested_tables:
+            return [race_json(row) for _, row in races.iterrows()], None
+
+        table, key = nested_tables[query['resource']]
+        if not local_store.has_table(table):
+            return [], key
+        entries = local_store.load_table(table)
+        entries = self.with_competitors(entries.loc[entries['raceId'].isin(races['raceId'])], query)
+        if 'statusId' in entries:
+            statuses = local_store.load_table('status') if local_store.has_table('status') else None
+            entries = entries.merge(statuses, on='statusId', how='left') if statuses is not None else entries.assign(status=entries['statusId'].astype(str))
+        build_json = qualifying_json if key == 'QualifyingResults' else result_json
+        order = 'position' if key == 'QualifyingResults' else 'positionOrder'
+
+        race_list = []
+        for _, race in races.iterrows():
+            race_entries = entries.loc[entries['raceId'] == race['raceId']].sort_values(by=[order])
+            if not race_entries.empty:
+                race_list.append(dict(race_json(race), **{key: [build_json(row) for _, row in race_entries.iterrows()]}))
+        return race_list, key
+
+    def driver_teams(self, year, round):
+        # Returns the constructors every driver raced for up to a round of a season.
+        races = local_store.load_table('races')
+        race_ids = races.loc[(races['year'] == year) & (races['round'] <= round), 'raceId']
+        results = local_store.load_table('results')
+        results = results.loc[results['raceId'].isin(race_ids)].drop_duplicates(subset=['driverId', 'constructorId'])
+        results = results.merge(prefixed('constructors', 'constructor_', 'constructorId'), on='constructorId')
+        return {driver: [constructor_json(row) for _, row in teams.iterrows()] for driver, teams in results.groupby('driverId')}
+
+    def standings_lists(self, query):
+        # Returns the standings lists of a standings query, either after a given
+        # round or at the end of every season, and the key of the standings.
+        resource = query['resource']
+        competitor = 'driver' if resource == 'driverStandings' else 'constructor'
+        standings = local_store.load_table(competitor + '_standings')
+        standings = standings.merge(local_store.load_table('races')[['raceId', 'year', 'round']], on='raceId')
+
+        if query['season']:
+            standings = standings.loc[standings['year'] == self.season(query)]
+        if query['season'] and query['round'] not in (None, '0', 'last'):
+            standings = standings.loc[standings['round'] == int(query['round'])]
+        else:
+            standings = standings.loc[standings['round'] == standings.groupby('year')['round'].transform('max')]
+        if resource in query['filters']:
+            standings = standings.loc[standings['position'] == int(query['filters'][resource])]
+        standings = self.with_competitors(standings, query)
+
+        key = 'DriverStandings' if competitor == 'driver' else 'ConstructorStandings'
+        lists = []
+        for (year, round), season in standings.groupby(['year', 'round'], sort=True):
+            season = season.sort_values(by=['position'])
+            if competitor == 'driver':
+                teams = self.driver_teams(year, round)
+                entries = [dict(standing_json(row), Driver=driver_json(row), Constructors=teams.get(row['driverId'], []))
+                           for _, row in season.iterrows()]
+            else:
+                entries = [dict(standing_json(row), Constructor=constructor_json(row)) for _, row in season.iterrows()]
+            lists.append({'season': text(year), 'round': text(round), key: entries})
+        return lists, key
+
+    def listing(self, query):
+        # Returns the drivers, constructors or circuits of a query, with the
+        # name of their table and list.
+        resource = query['resource']
+        races = self.races(query) if query['season'] else None
+        if resource == 'circuits':
+            circuits = prefixed('circuits', 'circuit_', 'circuitId')
+            if races is not None:
+                circuits = circuits.loc[circuits['circuitId'].isin(races['circuitId'])]
+            if 'circuits' in query['filters']:
+                circuits = circuits.loc[circuits['circuit_circuitRef'] == query['filters']['circuits']]
+            items = [circuit_json(row) for _, row in circuits.sort_values(by=['circuit_circuitRef']).iterrows()]
+            return items, 'CircuitTable', 'Circuits'
+
+        results = local_store.load_table('results')
+        if races is not None:
+            results = results.loc[results['raceId'].isin(races['raceId'])]
+        if resource == 'drivers':
+            drivers = prefixed('drivers', 'driver_', 'driverId')
+            drivers = drivers.loc[drivers['driverId'].isin(results['driverId'])]
+            if 'drivers' in query['filters']:
+                drivers = drivers.loc[drivers['driver_driverRef'] == query['filters']['drivers']]
+            items = [driver_json(row) for _, row in drivers.sort_values(by=['driver_driverRef']).iterrows()]
+            return items, 'DriverTable', 'Drivers'
+        constructors = prefixed('constructors', 'constructor_', 'constructorId')
+        constructors = constructors.loc[constructors['constructorId'].isin(results['constructorId'])]
+        if 'constructors' in query['filters']:
+            constructors = constructors.loc[constructors['constructor_constructorRef'] == query['filters']['constructors']]
+        items = [constructor_json(row) for _, row in constructors.sort_values(by=['constructor_constructorRef']).iterrows()]
+        return items, 'ConstructorTable', 'Constructors'
+
+    def respond(self, path, limit, offset):
+        # Returns the MRData of an API path, paginated by limit and offset, or
+        # None if the path isn't supported.
+        query = parse_path(path)
+        resource = query['resource']
+        if resource in ('drivers', 'constructors', 'circuits'):
+            items, table, key = self.listing(query)
+            return {'total': text(len(items)), table: {key: items[offset:offset + limit]}}
+        if resource in ('driverStandings', 'constructorStandings'):
+            lists, key = self.standings_lists(query)
+            page, total = paginate(lists, key, limit, offset)
+            return {'total': text(total), 'StandingsTable': {'StandingsLists': page}}
+        if resource is None or resource in nested_tables:
+            races, key = self.race_table(query)
+            if key is None:
+                return {'total': text(len(races)), 'RaceTable': {'Races': races[offset:offset + limit]}}
+            page, total = paginate(races, key, limit, offset)
+            return {'total': text(total), 'RaceTable': {'Races': page}}
+        return None
+
+
+class MockErgast:
+    # Serves the mock API on localhost. Responses come from fixtures_dir if a
+    # fixture for the request has been recorded, and from the local store
+    # otherwise. If an upstream API is given, requests without a fixture are
+    # forwarded to it and the responses recorded as fixtures instead.
+
+    def __init__(self, fixtures_dir=None, use_store=True, latency=0.0, error_rate=0.0, rate_limit=None, seed=0, upstream=None):
+        self.fixtures_dir = fixtures_dir
+        self.upstream = upstream
+        self.source = DumpSource() if use_store else None
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.request_count = 0
+        self.error_count = 0
+        self.throttled_count = 0
+        self._random = random.Random(seed)
+        self._recent = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self, port=0):
+        # Starts serving on a background thread and returns the base URL to use
+        # in place of http://ergast.com/api/f1.
+        mock = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = mock.handle(self.path)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return 'http://127.0.0.1:{}{}'.format(self._server.server_port, api_path.rstrip('/'))
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def throttle(self):
+        # Returns True if the request goes over the rate limit of rate_limit
+        # requests in any one second window.
+        if self.rate_limit is None:
+            return False
+        now = time.monotonic()
+        self._recent = [moment for moment in self._recent if now - moment < 1]
+        if len(self._recent) >= self.rate_limit:
+            return True
+        self._recent.append(now)
+        return False
+
+    def handle(self, request_path):
+        # Returns the status and body of the response to a request.
+        with self._lock:
+            self.request_count += 1
+            throttled = self.throttle()
+            failed = not throttled and self._random.random() < self.error_rate
+            self.throttled_count += throttled
+            self.error_count += failed
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            return 429, b'{"error": "Too Many Requests"}'
+        if failed:
+            return 503, b'{"error": "Injected failure"}'
+
+        path = request_path[len(api_path):] if request_path.startswith(api_path) else request_path.lstrip('/')
+        if self.fixtures_dir:
+            fixture_path = os.path.join(self.fixtures_dir, fixture_name(path))
+            if not os.path.exists(fixture_path) and self.upstream:
+                self.record(path, fixture_path)
+            if os.path.exists(fixture_path):
+                with open(fixture_path, 'rb') as f:
+                    return 200, f.read()
+
+        if self.source is not None:
+            parts = urllib.parse.urlsplit(path)
+            params = urllib.parse.parse_qs(parts.query)
+            limit = int(params.get('limit', ['30'])[0])
+            offset = int(params.get('offset', ['0'])[0])
+            data = self.source.respond(parts.path, limit, offset)
+            if data is not None:
+                mrdata = {'xmlns': 'http://ergast.com/mrd/1.4', 'series': 'f1', 'url': 'http://ergast.com/api/f1/' + parts.path,
+                          'limit': text(limit), 'offset': text(offset)}
+                mrdata.update(data)
+                return 200, json.dumps({'MRData': mrdata}).encode()
+        return 404, json.dumps({'error': 'Nothing to serve for ' + path}).encode()
+
+    def record(self, path, fixture_path):
+        # Fetches a response from the upstream API and saves it as a fixture.
+        r = requests.get(self.upstream.rstrip('/') + '/' + path)
+        if r.status_code != 200:
+            return
+        os.makedirs(self.fixtures_dir, exist_ok=True)
+        with open(fixture_path, 'wb') as f:
+            f.write(r.content)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the Ergast API.')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--fixtures', help='Directory of recorded responses to serve before falling back to the local store.')
+    parser.add_argument('--no-store', action='store_true', help='Only serve recorded fixtures.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before every response.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests to fail with a 503.')
+    parser.add_argument('--rate-limit', type=int, help='Requests per second to allow before responding with a 429.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the injected errors.')
+    parser.add_argument('--record', metavar='UPSTREAM', help='Record missing fixtures from this API, eg. http://ergast.com/api/f1.')
+    args = parser.parse_args()
+
+    mock = MockErgast(args.fixtures, not args.no_store, args.latency, args.error_rate, args.rate_limit, args.seed, args.record)
+    print('Serving the mock Ergast API at ' + mock.start(args.port))
+    print('Run the app against it with ERGAST_BASE_URL set to that address.')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
@@ -1,60 +1,169 @@
+import collections
+import functools
+import os
+import threading
+import numpy as np
+import pandas as pd
 import plotly.express as px
-
-def draw_sunsetdark_line_chart(selected_points_df, x, y, color, hover_name, hover_data, x_label, y_label, color_label):
-    competitor_standings_fig = px.line(selected_points_df,
-            x=x,
-            y=y,
-            color=color,
-            hover_name=hover_name,
-            hover_data={
-                hover_data:False
-            },
-            labels={
-                x:x_label,
-                y:y_label,
-                color:color_label
-            },
-            color_discrete_sequence=px.colors.sequential.Sunsetdark
-            # color_discrete_map={
-            #     "hamilton": "black",
-            #     "bottas":"blue",
-            #     "hhhh":"red"
-            # }
+import instrumentation
+
+# Figures built by get_chart are kept so reruns triggered by unrelated widgets
+# reuse them instead of rebuilding identical figures. Cached figures are shared
+# and must not be modified.
+max_cached_figures = int(os.environ.get('F1_FIGURE_CACHE_SIZE', 64))
+
+# Line charts with more points than this are drawn with WebGL (Scattergl)
+# traces, which stay responsive where SVG traces bog the browser down. Series
+# longer than F1_LINE_MAX_POINTS (0 for no limit) are downsampled with LTTB.
+webgl_threshold = int(os.environ.get('F1_WEBGL_THRESHOLD', 1000))
+max_line_points = int(os.environ.get('F1_LINE_MAX_POINTS', 0))
+
+palettes = {
+    'viridis': px.colors.sequential.Viridis,
+    'sunsetdark': px.colors.sequential.Sunsetdark,
+}
+chart_functions = {
+    'line': px.line,
+    'pie': px.pie,
+    'bar': px.bar,
+}
+
+_figures = collections.OrderedDict()
+_figures_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def get_layout(kind):
+    # Returns the base layout of a kind of chart, built once. The legend is
+    # hidden by default as it cramps the layout.
+    margin = dict(
+        l=0,
+        r=0,
+        t=0,
+        b=0
     )
+    if kind == 'pie':
+        return dict(
+            showlegend=False,
+            margin=margin,
+            dragmode=False
+        )
 
-    competitor_standings_fig.update_layout(
-        xaxis = dict(
-            tickmode = 'linear',
-            tick0 = 1,
-            dtick = 1,
-            showgrid = False
+    layout = dict(
+        xaxis=dict(
+            showgrid=False
         ),
-        yaxis = dict(
+        yaxis=dict(
             gridcolor='Silver'
         ),
-        legend=dict(
-                orientation="h",
-                yanchor="top",
-                y=-0.3,
-                xanchor="center",
-                x=0.5
-        ),
         showlegend=False,
-        margin=dict(
-            l=0,
-            r=0,
-            t=0,
-            b=0
-        ),
+        margin=margin,
         plot_bgcolor='rgba(0,0,0,0)',
         dragmode=False
     )
+    if kind == 'line':
+        layout['xaxis'].update(tickmode='linear', tick0=1, dtick=1)
+        layout['legend'] = dict(
+            orientation="h",
+            yanchor="top",
+            y=-0.3,
+            xanchor="center",
+            x=0.5
+        )
+    return layout
 
-    return competitor_standings_fig
 
+@instrumentation.timed('figure')
+def draw_chart(kind, df, palette, show_legend=False, **options):
+    # Builds a line, pie or bar chart of a dataframe in one of the palettes.
+    # Options are passed on to the plotly express function of the chart kind.
+    fig = chart_functions[kind](df, color_discrete_sequence=palettes[palette], **options)
+    fig.update_layout(get_layout(kind), showlegend=show_legend)
+    if kind == 'bar':
+        fig.update_traces(marker=dict(line=dict(width=0, color='black')))
+    return fig
 
-def draw_viridis_line_chart(selected_points_df, x, y, color, hover_name, hover_data, x_label, y_label, color_label):
-    competitor_standings_fig = px.line(selected_points_df,
+
+def fingerprint(df):
+    # Returns a hash of a dataframe's values, so a cached figure is never
+    # reused for data that has changed (eg. after a live refresh).
+    return int(pd.util.hash_pandas_object(df, index=False).sum())
+
+
+def get_chart(key, kind, df, palette, show_legend=False, **options):
+    # Returns a chart from the figure cache, building it with draw_chart if it
+    # isn't there. The key identifies the chart and its inputs (eg. the season
+    # and selected competitors).
+    cache_key = (key, kind, palette, show_legend, repr(sorted(options.items())), fingerprint(df))
+    with _figures_lock:
+        if cache_key in _figures:
+            _figures.move_to_end(cache_key)
+            return _figures[cache_key]
+
+    fig = draw_chart(kind, df, palette, show_legend, **options)
+    with _figures_lock:
+        _figures[cache_key] = fig
+        while len(_figures) > max_cached_figures:
+            _figures.popitem(last=False)
+    return fig
+
+
+def make_chart(key, kind, df, palette, show_legend, **options):
+    # Goes through the figure cache if a key is given.
+    if key is None:
+        return draw_chart(kind, df, palette, show_legend, **options)
+    return get_chart(key, kind, df, palette, show_legend, **options)
+
+
+def lttb(x, y, threshold):
+    # Returns the indexes of the points kept when downsampling a series to
+    # threshold points with Largest-Triangle-Three-Buckets. The first and last
+    # points are always kept, and from each bucket in between the point forming
+    # the largest triangle with the last kept point and the next bucket's average.
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    edges = np.floor(np.arange(threshold - 1) * every).astype(int) + 1
+    edges[-1] = n - 1
+    keep = np.empty(threshold, dtype=int)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+@instrumentation.timed('transform')
+def downsample(df, x, y, group, max_points):
+    # Downsamples every group's series (eg. each driver's points) to at most
+    # max_points points with LTTB. The points kept are real data points, so
+    # hovering over them still shows exact values.
+    if not max_points or df.empty or df.groupby(group, observed=True).size().max() <= max_points:
+        return df
+    parts = []
+    for _, series_df in df.groupby(group, sort=False, observed=True):
+        series_df = series_df.sort_values(by=[x], kind='mergesort')
+        keep = lttb(series_df[x].to_numpy(dtype=float), series_df[y].to_numpy(dtype=float), max_points)
+        parts.append(series_df.iloc[keep])
+    return pd.concat(parts)
+
+
+def draw_line_chart(selected_points_df, x, y, color, hover_name, hover_data, x_label, y_label, color_label, palette, show_legend=False, key=None, max_points=None):
+    # Large charts are downsampled to max_points per line (F1_LINE_MAX_POINTS by
+    # default) and drawn with WebGL above webgl_threshold points.
+    max_points = max_line_points if max_points is None else max_points
+    selected_points_df = downsample(selected_points_df, x, y, color, max_points)
+    return make_chart(key, 'line', selected_points_df, palette, show_legend,
+        render_mode='webgl' if len(selected_points_df) > webgl_threshold else 'svg',
         x=x,
         y=y,
         color=color,
@@ -66,184 +175,24 @@ def draw_viridis_line_chart(selected_points_df, x, y, color, hover_name, hover_d
             x:x_label,
             y:y_label,
             color:color_label
-        },
-        color_discrete_sequence=px.colors.sequential.Viridis
-        # color_discrete_map={
-        #     "hamilton": "black",
-        #     "bottas":"blue",
-        #     "hhhh":"red"
-        # }
-    )
-
-    competitor_standings_fig.update_layout(
-        xaxis = dict(
-            tickmode = 'linear',
-            tick0 = 1,
-            dtick = 1,
-            showgrid = False
-        ),
-        yaxis = dict(
-            gridcolor='Silver'
-        ),
-        legend=dict(
-                orientation="h",
-                yanchor="top",
-                y=-0.3,
-                xanchor="center",
-                x=0.5
-        ),
-        showlegend=False,
-        margin=dict(
-            l=0,
-            r=0,
-            t=0,
-            b=0
-        ),
-        plot_bgcolor='rgba(0,0,0,0)',
-        dragmode=False
+        }
     )
 
-    return competitor_standings_fig
 
-
-def draw_sunsetdark_pie_chart(points_scoring_competitor, values, names):
-    competitor_standings_pie = px.pie(points_scoring_competitor,
+def draw_pie_chart(points_scoring_competitor, values, names, palette, show_legend=False, key=None):
+    return make_chart(key, 'pie', points_scoring_competitor, palette, show_legend,
         values=values,
-        names=names,
-        color_discrete_sequence=px.colors.sequential.Sunsetdark
-    )
-
-    competitor_standings_pie.update_layout(
-        showlegend=False,
-        margin=dict(
-            l=0,
-            r=0,
-            t=0,
-            b=0
-        ),
-        dragmode=False
-    )
-
-    return competitor_standings_pie
-
-
-def draw_viridis_pie_chart(points_scoring_competitor, values, names):
-    competitor_standings_pie = px.pie(points_scoring_competitor,
-                values=values,
-                names=names,
-                color_discrete_sequence=px.colors.sequential.Viridis
-            )
-
-    competitor_standings_pie.update_layout(
-        showlegend=False,
-        margin=dict(
-            l=0,
-            r=0,
-            t=0,
-            b=0
-        ),
-        dragmode=False
-    )
-
-    return competitor_standings_pie
-
-
-def turn_on_constructor_legends(constructor_standings_fig, constructor_standings_pie):
-    constructor_standings_fig.update_layout(
-        showlegend=True
+        names=names
     )
-    constructor_standings_pie.update_layout(
-        showlegend=True
-    )
-    return constructor_standings_fig, constructor_standings_pie
-
-
-def turn_on_driver_legends(driver_standings_fig, driver_standings_pie):
-    driver_standings_fig.update_layout(
-        showlegend=True
-    )
-    driver_standings_pie.update_layout(
-        showlegend=True
-    )
-    return driver_standings_fig, driver_standings_pie
-
-
-def draw_viridis_bar_chart(df, x_col, y_col, x_label, y_label, colour):
-    fig = px.bar(data_frame=df,
-        x=x_col,
-        y=y_col,
-        labels={
-            x_col:x_label,
-            y_col:y_label
-            },
-        color=colour,
-        color_discrete_sequence=px.colors.sequential.Viridis
-        )
-
-    fig.update_layout(
-        xaxis = dict(
-            showgrid = False
-        ),
-        yaxis = dict(
-            gridcolor='Silver'
-        ),
-        margin=dict(
-            l=0,
-            r=0,
-            t=0,
-            b=0
-        ),
-        plot_bgcolor='rgba(0,0,0,0)',
-        showlegend=False,
-        dragmode=False
-    )
-
-    fig.update_traces(marker=dict( 
-        line=dict(width=0,
-            color='black'
-            )
-        )
-    )
-
-    return fig
 
 
-def draw_sunsetdark_bar_chart(df, x_col, y_col, x_label, y_label, colour):
-    fig = px.bar(data_frame=df,
+def draw_bar_chart(df, x_col, y_col, x_label, y_label, colour, palette, show_legend=False, key=None):
+    return make_chart(key, 'bar', df, palette, show_legend,
         x=x_col,
         y=y_col,
         labels={
             x_col:x_label,
             y_col:y_label
-            },
-        color=colour,
-        color_discrete_sequence=px.colors.sequential.Sunsetdark
-        )
-
-    fig.update_layout(
-        xaxis = dict(
-            showgrid = False
-        ),
-        yaxis = dict(
-            gridcolor='Silver'
-        ),
-        margin=dict(
-            l=0,
-            r=0,
-            t=0,
-            b=0
-        ),
-        plot_bgcolor='rgba(0,0,0,0)',
-        showlegend=False,
-        dragmode=False
-    )
-
-    fig.update_traces(marker=dict( 
-        line=dict(width=0,
-            color='black'
-            )
-        )
+        },
+        color=colour
     )
-
-    return fig
-    
\ No newline at end of file
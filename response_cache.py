@@ -0,0 +1,125 @@
+from datetime import date
+import os
+import re
+import sqlite3
+import threading
+import time
+import json_codec
+
+cache_path = os.environ.get('F1_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'ergast.sqlite'))
+max_cache_bytes = int(os.environ.get('F1_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Seconds a response stays fresh. Finished seasons never change, so their
+# responses are kept until evicted (None). Anything touching the current
+# season, or spanning every season, is refreshed regularly.
+historical_ttl = None
+current_ttl = int(os.environ.get('F1_CACHE_CURRENT_TTL', 60 * 60))
+
+season_pattern = re.compile(r'/api/f1/(\d{4})(?:/|\.json)')
+
+
+class ResponseCache:
+    # A disk-backed cache of decoded Ergast JSON responses keyed by URL. The
+    # cache lives in a SQLite file so that it survives restarts and can be
+    # shared by every process pointed at the same path.
+
+    def __init__(self, path, max_bytes=max_cache_bytes, historical_ttl=historical_ttl, current_ttl=current_ttl):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.historical_ttl = historical_ttl
+        self.current_ttl = current_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        # Opens the SQLite file on first use, creating the table if needed.
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'url TEXT PRIMARY KEY, body TEXT NOT NULL, size INTEGER NOT NULL, '
+                'expires_at REAL, last_access REAL NOT NULL)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+            self._connection.commit()
+        return self._connection
+
+    def ttl_for(self, url):
+        # Returns how long a response for the given URL stays fresh, based on
+        # whether it belongs to a finished season.
+        match = season_pattern.search(url)
+        if match and int(match.group(1)) < date.today().year:
+            return self.historical_ttl
+        return self.current_ttl
+
+    def get(self, url):
+        # Returns the cached JSON for a URL, or None if it is missing or stale.
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute('SELECT body, expires_at FROM responses WHERE url = ?', (url,)).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                self.misses += 1
+                return None
+            connection.execute('UPDATE responses SET last_access = ? WHERE url = ?', (now, url))
+            connection.commit()
+            self.hits += 1
+        return json_codec.loads(row[0])
+
+    def set(self, url, payload):
+        # Stores the JSON for a URL and evicts least recently used responses
+        # if the cache has grown past its size limit.
+        body = json_codec.dumps(payload)
+        now = time.time()
+        ttl = self.ttl_for(url)
+        expires_at = None if ttl is None else now + ttl
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                'INSERT OR REPLACE INTO responses (url, body, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)',
+                (url, body, len(body), expires_at, now)
+            )
+            self._evict(connection)
+            connection.commit()
+
+    def _evict(self, connection):
+        # Deletes least recently used responses until the cache fits in max_bytes.
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in connection.execute('SELECT url, size FROM responses ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            connection.execute('DELETE FROM responses WHERE url = ?', (url,))
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        # Removes every cached response.
+        with self._lock:
+            connection = self._connect()
+            connection.execute('DELETE FROM responses')
+            connection.commit()
+
+    def stats(self):
+        # Returns hit/miss counters and the current size of the cache.
+        with self._lock:
+            entries, size = self._connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': size,
+        }
+
+
+default_cache = ResponseCache(cache_path)
+
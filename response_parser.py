@@ -0,0 +1,185 @@
+import pandas as pd
+
+# Builds typed pandas DataFrames straight from Ergast API responses. A parser
+# describes each column it wants as a field: where to find the value in a
+# record (a path of keys/indexes, or a function of the record) and the dtype to
+# store it as. Only those values are read, straight into one list per column,
+# so no intermediate dicts are built and nothing is left as a column of strings.
+
+
+def driver_name(record):
+    driver = record['Driver']
+    return driver['givenName'] + ' ' + driver['familyName']
+
+
+driver_fields = {
+    'driverID': (('Driver', 'driverId'), 'object'),
+    'driver': (driver_name, 'object'),
+    'nationality': (('Driver', 'nationality'), 'category'),
+}
+constructor_fields = {
+    'constructorID': (('Constructor', 'constructorId'), 'category'),
+    'constructor': (('Constructor', 'name'), 'category'),
+}
+standing_fields = {
+    # Position is missing for drivers excluded from a championship (eg. 1997)
+    'position': (('position',), 'Int32'),
+    'positionText': (('positionText',), 'category'),
+    'points': (('points',), 'float64'),
+    'wins': (('wins',), 'int32'),
+}
+driver_standing_fields = dict(
+    standing_fields,
+    **driver_fields,
+    constructorID=(('Constructors', 0, 'constructorId'), 'category'),
+    constructor=(('Constructors', 0, 'name'), 'category'),
+)
+constructor_standing_fields = dict(
+    standing_fields,
+    constructorID=(('Constructor', 'constructorId'), 'category'),
+    name=(('Constructor', 'name'), 'category'),
+    nationality=(('Constructor', 'nationality'), 'category'),
+)
+result_fields = dict(
+    number=(('number',), 'Int32'),
+    position=(('position',), 'int32'),
+    positionText=(('positionText',), 'category'),
+    grid=(('grid',), 'int32'),
+    points=(('points',), 'float64'),
+    **driver_fields,
+    **constructor_fields,
+    laps=(('laps',), 'int32'),
+    status=(('status',), 'category'),
+    Time=(('Time',), 'object'),
+)
+qualifying_fields = dict(
+    number=(('number',), 'Int32'),
+    position=(('position',), 'int32'),
+    **driver_fields,
+    **constructor_fields,
+    Q1=(('Q1',), 'object'),
+    Q2=(('Q2',), 'object'),
+    Q3=(('Q3',), 'object'),
+)
+race_fields = {
+    'season': (('season',), 'int16'),
+    'round': (('round',), 'int16'),
+    'url': (('url',), 'object'),
+    'raceName': (('raceName',), 'object'),
+    'date': (('date',), 'datetime64[ns]'),
+    'time': (('time',), 'object'),
+    'circuitID': (('Circuit', 'circuitId'), 'object'),
+    'circuitName': (('Circuit', 'circuitName'), 'object'),
+    'locality': (('Circuit', 'Location', 'locality'), 'object'),
+    'country': (('Circuit', 'Location', 'country'), 'category'),
+}
+
+
+def get_value(record, source):
+    # Returns the value at a path in a record, or None if any part of it is missing.
+    if callable(source):
+        return source(record)
+    for key in source:
+        try:
+            record = record[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return record
+
+
+def to_column(values, dtype):
+    # Converts a list of values (numbers come as strings from Ergast) to a pandas
+    # Series of the given dtype.
+    if dtype == 'object':
+        return pd.Series(values, dtype=object)
+    if dtype == 'category':
+        return pd.Series(values, dtype='category')
+    if dtype.startswith('datetime64'):
+        return pd.to_datetime(pd.Series(values, dtype=object))
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').astype(dtype)
+
+
+def parse_records(records, fields, group_fields=None, groups=None):
+    # Builds a DataFrame with a column for every field of a list of records. If
+    # group_fields are given, they are read from groups, the record each of the
+    # records is nested in (eg. the race of each result), and come first.
+    columns = {}
+    for name, (source, dtype) in (group_fields or {}).items():
+        columns[name] = to_column([get_value(group, source) for group in groups], dtype)
+    for name, (source, dtype) in fields.items():
+        columns[name] = to_column([get_value(record, source) for record in records], dtype)
+    return pd.DataFrame(columns)
+
+
+def parse_nested(groups, key, fields, group_fields):
+    # Parses the records nested in a list of groups (eg. the Results of every
+    # race), adding the group_fields of each record's group.
+    records = []
+    parents = []
+    for group in groups:
+        nested = group.get(key, [])
+        records += nested
+        parents += [group] * len(nested)
+    return parse_records(records, fields, group_fields, parents)
+
+
+def select(fields, names):
+    # Returns the fields with the given names, in that order.
+    return {name: fields[name] for name in names}
+
+
+def nest(fields, *path):
+    # Returns the fields read from a record nested at path (eg. the first
+    # DriverStandings of a StandingsList) instead of the record itself.
+    nested = {}
+    for name, (source, dtype) in fields.items():
+        if callable(source):
+            nested[name] = ((lambda record, source=source: source(get_value(record, path))), dtype)
+        else:
+            nested[name] = (tuple(path) + tuple(source), dtype)
+    return nested
+
+
+def present(fields, records, optional):
+    # Drops the optional fields missing from the first record (eg. Q3 in
+    # qualifying formats without a third session).
+    return {name: field for name, field in fields.items()
+            if name not in optional or (records and get_value(records[0], field[0]) is not None)}
+
+
+def standings_table(response):
+    # Returns the StandingsLists of a standings response.
+    return response['MRData']['StandingsTable']['StandingsLists']
+
+
+def races_table(response):
+    # Returns the Races of a schedule or results response.
+    return response['MRData']['RaceTable']['Races']
+
+
+def same_group(group, other):
+    # Returns True if two records are the same apart from their nested lists
+    # (eg. a race split across two pages of results).
+    return ({key: value for key, value in group.items() if not isinstance(value, list)} ==
+            {key: value for key, value in other.items() if not isinstance(value, list)})
+
+
+def merge_page(response, page):
+    # Adds the rows of another page of a paginated response to it. Ergast pages
+    # count the innermost rows (eg. results rather than races), so a record cut
+    # off at the end of one page carries on at the start of the next.
+    for name, table in page['MRData'].items():
+        if not name.endswith('Table'):
+            continue
+        merged_table = response['MRData'].setdefault(name, {})
+        for key, records in table.items():
+            if not isinstance(records, list):
+                continue
+            merged = merged_table.setdefault(key, [])
+            if merged and records and same_group(merged[-1], records[0]):
+                for nested_key, nested in records[0].items():
+                    if isinstance(nested, list):
+                        merged[-1].setdefault(nested_key, []).extend(nested)
+                records = records[1:]
+            merged.extend(records)
+    return response
@@ -0,0 +1,107 @@
+import bisect
+import re
+import unicodedata
+
+# In-memory index for looking up drivers, constructors and circuits by name as
+# you type. Text is matched without case or accents ('perez' finds Pérez), and
+# each word of a query can match a word of a row exactly, as a prefix, as a
+# substring (for two letters or more) or, failing those, fuzzily (by the
+# trigrams the words share). Scores are added up over the words of the query,
+# so rows matching more of them come first.
+exact_score = 1.0
+prefix_score = 0.8
+substring_score = 0.6
+fuzzy_score = 0.5
+min_similarity = 0.4
+
+
+def normalize(text):
+    # Lowercases text, strips accents and turns anything that isn't a letter or
+    # digit into a space, eg. 'Hülkenberg' -> 'hulkenberg', 'max_verstappen'
+    # -> 'max verstappen'.
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r'[^0-9a-z]+', ' ', text.lower()).strip()
+
+
+def trigrams(word):
+    padded = ' ' + word + ' '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    # Index of the words in some columns of a DataFrame. Built once, after which
+    # a lookup only touches the index's words, not the DataFrame.
+
+    def __init__(self, df, columns):
+        self.df = df
+        self.rows = {}
+        for position, values in enumerate(zip(*[df[column].tolist() for column in columns])):
+            for value in values:
+                if value is None or value != value:
+                    continue
+                for word in normalize(value).split():
+                    self.rows.setdefault(word, set()).add(position)
+        self.words = sorted(self.rows)
+
+        # Every word in one string, to find substrings with str.find instead of
+        # checking each word
+        self.text = '\n'.join(self.words)
+        self.starts = []
+        start = 0
+        for word in self.words:
+            self.starts.append(start)
+            start += len(word) + 1
+
+        self.trigrams = {}
+        for word in self.words:
+            for trigram in trigrams(word):
+                self.trigrams.setdefault(trigram, []).append(word)
+
+    def match_word(self, term):
+        # Returns a dict of word -> score of the index's words matching a term.
+        matches = {}
+        start = bisect.bisect_left(self.words, term)
+        for word in self.words[start:]:
+            if not word.startswith(term):
+                break
+            matches[word] = exact_score if word == term else prefix_score
+        if len(term) > 1:
+            found = self.text.find(term)
+            while found != -1:
+                word = self.words[bisect.bisect_right(self.starts, found) - 1]
+                matches.setdefault(word, substring_score)
+                found = self.text.find(term, found + 1)
+        if matches:
+            return matches
+
+        # Nothing contains the term, so look for words that are spelt similarly
+        term_trigrams = trigrams(term)
+        shared = {}
+        for trigram in term_trigrams:
+            for word in self.trigrams.get(trigram, []):
+                shared[word] = shared.get(word, 0) + 1
+        for word, count in shared.items():
+            similarity = 2 * count / (len(term_trigrams) + len(trigrams(word)))
+            if similarity >= min_similarity:
+                matches[word] = fuzzy_score * similarity
+        return matches
+
+    def search(self, query, limit=None):
+        # Returns a list of (row position, score) of the rows matching any word
+        # of a query, best first. Ties keep the DataFrame's order.
+        scores = {}
+        for term in normalize(query).split():
+            term_scores = {}
+            for word, score in self.match_word(term).items():
+                for position in self.rows[word]:
+                    if score > term_scores.get(position, 0):
+                        term_scores[position] = score
+            for position, score in term_scores.items():
+                scores[position] = scores.get(position, 0) + score
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
+
+    def find(self, query, limit=None):
+        # Returns the rows of the DataFrame matching a query, best first.
+        return self.df.iloc[[position for position, score in self.search(query, limit)]]
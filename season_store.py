@@ -0,0 +1,106 @@
+from datetime import date
+import os
+import shutil
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+
+# Every kind of season data (eg. 'driver_points' or 'schedule') gets its own
+# directory holding one uncompressed Arrow IPC file per season. Reads memory-map
+# those files, so every process serving the same season shares the OS page
+# cache instead of each holding its own copy.
+store_path = os.environ.get('F1_SEASON_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'seasons'))
+
+
+def season_path(kind, year):
+    return os.path.join(store_path, kind, '{}.arrow'.format(year))
+
+
+def dataset_path(kind):
+    return os.path.join(store_path, kind, 'dataset')
+
+
+def has_season(kind, year):
+    return os.path.exists(season_path(kind, year))
+
+
+def stored_seasons(kind):
+    # Returns the seasons stored for a kind of data, in order.
+    directory = os.path.join(store_path, kind)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(name[:-len('.arrow')]) for name in os.listdir(directory) if name.endswith('.arrow'))
+
+
+def write_season(kind, year, df):
+    # Writes a season's DataFrame to the store, replacing any previous version.
+    path = season_path(kind, year)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Write to a temporary file first so readers never see a partial file
+    temp_path = path + '.tmp{}'.format(os.getpid())
+    feather.write_feather(table, temp_path, compression='uncompressed')
+    os.replace(temp_path, path)
+
+
+def read_season(kind, year):
+    # Returns a season's DataFrame from the store, or None if it isn't stored.
+    if not has_season(kind, year):
+        return None
+    with pa.memory_map(season_path(kind, year)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def read_or_fetch(kind, year, fetch):
+    # Returns a season's DataFrame from the store, calling fetch and storing its
+    # result if the season isn't stored yet. Seasons that may still be running,
+    # and results flagged with df.attrs['incomplete'], are never stored.
+    if year >= date.today().year:
+        return fetch()
+    df = read_season(kind, year)
+    if df is None:
+        df = fetch()
+        if not df.attrs.get('incomplete'):
+            write_season(kind, year, df)
+    return df
+
+
+def compact(kind):
+    # Merges every per-season file of a kind of data into one Parquet dataset
+    # partitioned by season, for queries that span several seasons.
+    tables = []
+    for year in stored_seasons(kind):
+        with pa.memory_map(season_path(kind, year)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        tables.append(table.append_column('season_partition', pa.array([year] * table.num_rows, pa.int16())))
+    if not tables:
+        return
+
+    target = dataset_path(kind)
+    temp_target = target + '.tmp{}'.format(os.getpid())
+    ds.write_dataset(
+        pa.concat_tables(tables, promote=True),
+        temp_target,
+        format='parquet',
+        partitioning=ds.partitioning(pa.schema([('season_partition', pa.int16())]), flavor='hive')
+    )
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(temp_target, target)
+
+
+def read_seasons(kind, years=None):
+    # Returns the compacted data of a kind across seasons, optionally restricted
+    # to a list of seasons. Run compact first to include newly written seasons.
+    target = dataset_path(kind)
+    if not os.path.isdir(target):
+        return None
+    dataset = ds.dataset(target, format='parquet', partitioning='hive')
+    season_filter = None if years is None else ds.field('season_partition').isin(list(years))
+    return dataset.to_table(filter=season_filter).to_pandas().rename(columns={'season_partition': 'season'})
+
+
+if __name__ == '__main__':
+    for kind in sorted(os.listdir(store_path)) if os.path.isdir(store_path) else []:
+        compact(kind)
@@ -0,0 +1,89 @@
+import asyncio
+import concurrent.futures
+import threading
+import instrumentation
+
+# Shares identical calls that are in flight at the same time, eg. when several
+# sessions open the same season at once. A call for a key (a URL, or a season
+# and competitor type) that is already running waits for that call and gets its
+# result, or its exception, instead of starting another one. Finished results
+# aren't kept, that's left to the caches. Every call that waited on another is
+# recorded as a 'coalesced' span named after its group, so they show up in the
+# render timings and the Prometheus totals.
+
+
+class Group:
+    # The calls in flight for one kind of key.
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def join(self, key):
+        # Returns the Future of the call in flight for a key and False, or a
+        # new Future and True if there is none, in which case the caller has to
+        # make the call and finish it.
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._futures[key] = concurrent.futures.Future()
+            self.calls += 1
+            return future, True
+
+    def finish(self, key, future, result=None, error=None):
+        # Hands the result of a call to everything waiting on it. The key is
+        # released first, so later calls start afresh.
+        with self._lock:
+            del self._futures[key]
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def run(self, key, function, *args):
+        # Calls function(*args) unless a call for the key is already in flight.
+        # Returns the result and whether it came from another caller's call.
+        future, leader = self.join(key)
+        if not leader:
+            with instrumentation.span('coalesced', self.name):
+                return future.result(), True
+        try:
+            result = function(*args)
+        except BaseException as error:
+            self.finish(key, future, error=error)
+            raise
+        self.finish(key, future, result)
+        return result, False
+
+    def do(self, key, function, *args):
+        # Like run, but only returns the result.
+        return self.run(key, function, *args)[0]
+
+    async def run_async(self, key, function, *args):
+        # Async counterpart of run for coroutine functions, to be awaited on
+        # http_client's shared loop. The call runs as a task of its own, so it
+        # carries on for the other callers if the one that started it is cancelled.
+        future, leader = self.join(key)
+        if not leader:
+            with instrumentation.span('coalesced', self.name):
+                return await asyncio.wrap_future(future), True
+
+        def done(task):
+            if task.cancelled():
+                self.finish(key, future, error=asyncio.CancelledError())
+            else:
+                self.finish(key, future, None if task.exception() else task.result(), task.exception())
+
+        asyncio.ensure_future(function(*args)).add_done_callback(done)
+        return await asyncio.wrap_future(future), False
+
+    def stats(self):
+        # Returns the number of calls made and the number of calls that waited
+        # on one of them instead.
+        with self._lock:
+            return {'group': self.name, 'calls': self.calls, 'coalesced': self.coalesced}
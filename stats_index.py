@@ -0,0 +1,154 @@
+from datetime import date
+import argparse
+import functools
+import os
+import pandas as pd
+import data_processor
+import ergastpy
+import fetch_scheduler
+import http_client
+import local_store
+
+# Career totals of every driver and constructor, built once from every race
+# result and then kept up to date with `python stats_index.py update`.
+index_path = os.environ.get('F1_STATS_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'stats'))
+stats = ['starts', 'wins', 'poles', 'podiums', 'points']
+
+
+def aggregate(results_df, competitor):
+    # Adds up the career stats of every driver/constructor in a DataFrame of
+    # race results. A constructor's starts are the races it entered, not its cars.
+    flags = results_df.assign(
+        starts=1,
+        wins=(results_df['position'] == 1).astype(int),
+        poles=(results_df['grid'] == 1).astype(int),
+        podiums=(results_df['position'] <= 3).astype(int),
+    )
+    totals = flags.groupby(competitor)[stats].sum()
+    if competitor == 'constructorID':
+        entries = results_df.drop_duplicates(subset=[competitor, 'season', 'race'])
+        totals['starts'] = entries.groupby(competitor).size()
+    return totals
+
+
+def add_sprint_points(results_df, sprint_df):
+    # Adds the points every driver scored in a sprint to their result in the
+    # race of the same weekend. Sprints don't count towards the other stats.
+    if sprint_df.empty:
+        return results_df
+    keys = ['season', 'race', 'driverID']
+    sprint_points = sprint_df.groupby(keys)['points'].sum()
+    points = sprint_points.reindex(pd.MultiIndex.from_frame(results_df[keys]), fill_value=0).values
+    return results_df.assign(points=results_df['points'].values + points)
+
+
+def fetch_results(seasons):
+    # Fetches the results of every race and sprint in the given seasons from the
+    # API, one request per season and table, following the pages of each.
+    sprint_seasons = [season for season in seasons if season >= ergastpy.first_sprint_season]
+    urls = {(season, 'Results'): ergastpy.season_results_url(season) for season in seasons}
+    urls.update({(season, 'SprintResults'): ergastpy.season_sprint_url(season) for season in sprint_seasons})
+    responses, failures = http_client.run(fetch_scheduler.fetch_all(urls, paged=True))
+    assert not failures, 'Could not fetch {}'.format(sorted(urls[key] for key in failures))
+
+    results_df = pd.concat([data_processor.make_race_results_df(responses[(season, 'Results')]) for season in seasons], ignore_index=True)
+    if not sprint_seasons:
+        return results_df
+    sprint_df = pd.concat(
+        [data_processor.make_race_results_df(responses[(season, 'SprintResults')], 'SprintResults') for season in sprint_seasons],
+        ignore_index=True
+    )
+    return add_sprint_points(results_df, sprint_df)
+
+
+def get_all_results(seasons):
+    # Returns the results of every race in the given seasons, with the points
+    # scored in sprints, from the local store when it is enabled and from the
+    # API otherwise.
+    if local_store.enabled():
+        results_df = add_sprint_points(local_store.get_race_results(), local_store.get_race_results('sprint_results'))
+        return results_df.loc[results_df['season'].isin(seasons)]
+    return fetch_results(seasons)
+
+
+def save(drivers, constructors, races):
+    os.makedirs(index_path, exist_ok=True)
+    drivers.reset_index().to_parquet(os.path.join(index_path, 'drivers.parquet'), index=False)
+    constructors.reset_index().to_parquet(os.path.join(index_path, 'constructors.parquet'), index=False)
+    races.to_parquet(os.path.join(index_path, 'races.parquet'), index=False)
+    load.cache_clear()
+
+
+def build():
+    # Builds the index from every race result in F1 history.
+    results_df = get_all_results(ergastpy.iter_seasons())
+    races = results_df[['season', 'race']].drop_duplicates().reset_index(drop=True)
+    save(aggregate(results_df, 'driverID'), aggregate(results_df, 'constructorID'), races)
+
+
+def update():
+    # Adds the races completed since the index was built or last updated.
+    drivers, constructors, races = read_index()
+    last_season = int(races['season'].max())
+    results_df = get_all_results(range(last_season, date.today().year + 1))
+
+    indexed = pd.MultiIndex.from_frame(races)
+    results_df = results_df.loc[~pd.MultiIndex.from_frame(results_df[['season', 'race']]).isin(indexed)]
+    if results_df.empty:
+        return
+
+    drivers = drivers.add(aggregate(results_df, 'driverID'), fill_value=0)
+    constructors = constructors.add(aggregate(results_df, 'constructorID'), fill_value=0)
+    new_races = results_df[['season', 'race']].drop_duplicates()
+    save(drivers, constructors, pd.concat([races, new_races], ignore_index=True))
+
+
+def read_index():
+    # Reads the stored index, as DataFrames indexed by ID.
+    assert os.path.exists(os.path.join(index_path, 'races.parquet')), 'No stats index found. Run `python stats_index.py build` first.'
+    drivers = pd.read_parquet(os.path.join(index_path, 'drivers.parquet')).set_index('driverID')
+    constructors = pd.read_parquet(os.path.join(index_path, 'constructors.parquet')).set_index('constructorID')
+    races = pd.read_parquet(os.path.join(index_path, 'races.parquet'))
+    return drivers, constructors, races
+
+
+@functools.lru_cache(maxsize=None)
+def load():
+    # Loads the index into dicts for constant time lookups, along with every
+    # ranking pre-sorted.
+    drivers, constructors, races = read_index()
+    index = {}
+    for competitor_type, df in [('driver', drivers), ('constructor', constructors)]:
+        df = df.astype({stat: int for stat in stats if stat != 'points'})
+        index[competitor_type] = {
+            'stats': df.to_dict(orient='index'),
+            'rankings': {stat: df[stat].sort_values(ascending=False, kind='mergesort') for stat in stats},
+        }
+    return index
+
+
+def get_driver_stats(driver_id):
+    # Returns the career stats of a driver, or None if they never started a race.
+    return load()['driver']['stats'].get(driver_id)
+
+
+def get_constructor_stats(constructor_id):
+    # Returns the career stats of a constructor, or None if it never entered a race.
+    return load()['constructor']['stats'].get(constructor_id)
+
+
+def get_rankings(competitor_type, stat, count=50):
+    # Returns a pandas DataFrame of the top drivers/constructors by one of the stats.
+    ranking = load()[competitor_type]['rankings'][stat].head(count)
+    return pd.DataFrame({competitor_type + 'ID': ranking.index, stat: ranking.values})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or update the index of all-time driver and constructor stats.')
+    parser.add_argument('command', choices=['build', 'update'])
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build()
+    else:
+        update()
@@ -0,0 +1,166 @@
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import data_processor
+import mock_ergast
+
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+recorded_fixtures_dir = os.path.join(root, 'benchmarks', 'fixtures')
+
+# Standings responses for every race index of a season, keyed by race index.
+# These are synthetic: made up seasons in Ergast's response format, shaped like
+# 1950 and 1985. Drivers come and go during the 1950 one, so some have no
+# standings for the first races.
+seasons = [
+    ('synthetic_1950_driverStandings.json', 'driverID', data_processor.make_driver_df),
+    ('synthetic_1985_constructorStandings.json', 'constructorID', data_processor.make_constructor_df),
+]
+
+# Seasons to check on the responses recorded from the real API for the
+# benchmarks (see `python benchmarks/bench.py record`), when there are any
+recorded_seasons = [
+    (1985, 'driverStandings', 'driverID', data_processor.make_driver_df),
+    (2021, 'constructorStandings', 'constructorID', data_processor.make_constructor_df),
+]
+
+
+def load_races(name, make_df):
+    # Builds the dict of race index -> standings DataFrame that get_races returns.
+    with open(os.path.join(fixtures_dir, name)) as f:
+        responses = json.load(f)
+    return {int(race): make_df(response) for race, response in responses.items()}
+
+
+def load_recorded_races(year, resource, make_df):
+    # Same as load_races, from the benchmarks' recorded fixtures. Returns an
+    # empty dict if the season hasn't been recorded.
+    races = {}
+    while True:
+        path = os.path.join(recorded_fixtures_dir, mock_ergast.fixture_name('{}/{}/{}.json?limit=1000'.format(year, len(races), resource)))
+        if not os.path.exists(path):
+            return races
+        with open(path) as f:
+            races[len(races)] = make_df(json.load(f))
+
+
+def old_build_points_df(competitor_list, competitor, race_count, races):
+    # The row by row implementation build_points_df replaced, kept as the
+    # reference for its output. Rows are collected in a list rather than with
+    # DataFrame.append, which newer pandas no longer has.
+    rows = []
+    for i in range(0, len(competitor_list)):
+        for race in range(0, race_count):
+            current_standings = races[race]
+            current_points_df = current_standings.loc[current_standings[competitor] == competitor_list[i]]
+            current_points_df.reset_index(drop=True, inplace=True)
+            try:
+                current_points = current_points_df.iloc[0]['points']
+                new_row = {'points': float(current_points), 'race': int(race), competitor: competitor_list[i]}
+            except:
+                new_row = {'points': 0, 'race': int(race), competitor: competitor_list[i]}
+            rows.append(new_row)
+    all_points_df = pd.DataFrame(rows, columns=['points', 'race', competitor])
+    all_points_df.loc[(all_points_df.race == 0), 'race'] = race_count
+    all_points_df.sort_values(by=['race'], inplace=True)
+    return all_points_df
+
+
+def normalize(df, competitor):
+    # Puts both implementations' output in the same order and dtypes.
+    df = pd.DataFrame({
+        'points': df['points'].astype(float),
+        'race': df['race'].astype(int),
+        competitor: df[competitor].astype(object),
+    })
+    return df.sort_values(by=['race', competitor]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('name, competitor, make_df', seasons)
+def test_build_points_df_matches_old_implementation(name, competitor, make_df):
+    races = load_races(name, make_df)
+    race_count = len(races)
+    competitor_list = list(pd.unique(pd.concat([race_df[competitor] for race_df in races.values()])))
+    # A competitor without any standings, eg. one who entered but never started
+    competitor_list.append('no_standings')
+
+    expected = old_build_points_df(competitor_list, competitor, race_count, races)
+    points_df = data_processor.build_points_df(competitor_list, competitor, race_count, races)
+
+    pd.testing.assert_frame_equal(normalize(points_df, competitor), normalize(expected, competitor))
+    assert points_df['race'].is_monotonic_increasing
+
+
+@pytest.mark.parametrize('year, resource, competitor, make_df', recorded_seasons)
+def test_build_points_df_matches_old_implementation_on_recorded_season(year, resource, competitor, make_df):
+    races = load_recorded_races(year, resource, make_df)
+    if not races:
+        pytest.skip('No recorded {} {} in benchmarks/fixtures'.format(year, resource))
+    race_count = len(races)
+    competitor_list = list(pd.unique(pd.concat([race_df[competitor] for race_df in races.values()])))
+
+    expected = old_build_points_df(competitor_list, competitor, race_count, races)
+    points_df = data_processor.build_points_df(competitor_list, competitor, race_count, races)
+    pd.testing.assert_frame_equal(normalize(points_df, competitor), normalize(expected, competitor))
+
+
+def test_build_points_df_leaves_out_missing_races():
+    name, competitor, make_df = seasons[0]
+    races = load_races(name, make_df)
+    race_count = len(races)
+    competitor_list = races[0][competitor].tolist()
+    del races[3]
+
+    points_df = data_processor.build_points_df(competitor_list, competitor, race_count, races)
+    assert 3 not in set(points_df['race'])
+    assert len(points_df) == len(competitor_list) * (race_count - 1)
+
+
+def make_points_df(points):
+    # Builds a points DataFrame like build_points_df's from a dict of
+    # competitor -> points after each race.
+    competitors = list(points)
+    races = len(next(iter(points.values())))
+    return pd.DataFrame({
+        'points': np.array([points[c][race] for race in range(races) for c in competitors], dtype='float32'),
+        'race': np.repeat(np.arange(1, races + 1, dtype='int16'), len(competitors)),
+        'driverID': pd.Categorical([c for race in range(races) for c in competitors], categories=competitors),
+    })
+
+
+def test_build_standings_index():
+    points_df = make_points_df({'a': [10, 10, 16], 'b': [6, 16, 22], 'c': [0, 4, 16]})
+    index = data_processor.build_standings_index(points_df, 'driverID')
+    assert list(index) == [1, 2, 3]
+
+    race = index[2]
+    assert race['driverID'].tolist() == ['b', 'a', 'c']
+    assert race['position'].tolist() == [1, 2, 3]
+    assert race['gap_to_leader'].tolist() == [0, 6, 12]
+    assert race['gap_to_next'].isna().tolist() == [True, False, False]
+    assert race['gap_to_next'].tolist()[1:] == [6, 6]
+    assert race['position_change'].tolist() == [1, -1, 0]
+
+    # Tied competitors keep their order in the points DataFrame
+    assert index[3]['driverID'].tolist() == ['b', 'a', 'c']
+    assert index[3]['position_change'].tolist() == [0, 0, 0]
+    assert index[1]['position_change'].tolist() == [0, 0, 0]
+
+
+@pytest.mark.parametrize('name, competitor, make_df', seasons)
+def test_build_standings_index_matches_get_standings(name, competitor, make_df):
+    races = load_races(name, make_df)
+    points_df = data_processor.build_points_df(races[0][competitor].tolist(), competitor, len(races), races)
+    index = data_processor.build_standings_index(points_df, competitor)
+
+    for race in range(1, len(races) + 1):
+        standings = data_processor.get_standings(points_df, race)
+        assert index[race]['points'].tolist() == standings['points'].tolist()
+        assert data_processor.get_round_standings(index, race) is index[race]
+    assert data_processor.get_round_standings(index, len(races) + 1).empty
@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import pandas as pd
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import data_processor
+import data_scraper
+import local_store
+import mock_ergast
+
+# The benchmarks' responses recorded from the real API if there are any, and
+# their synthetic ones otherwise (see benchmarks/bench.py)
+recorded_fixtures_dir = os.path.join(root, 'benchmarks', 'fixtures')
+synthetic_fixtures_dir = os.path.join(root, 'benchmarks', 'synthetic_fixtures')
+fixtures_dir = recorded_fixtures_dir if os.path.isdir(recorded_fixtures_dir) else synthetic_fixtures_dir
+season_length = 22
+
+
+def load_fixture(path):
+    with open(os.path.join(fixtures_dir, mock_ergast.fixture_name(path))) as f:
+        return json.load(f)
+
+
+def normalize(df, competitor):
+    df = pd.DataFrame({
+        'points': df['points'].astype(float),
+        'race': df['race'].astype(int),
+        competitor: df[competitor].astype(object),
+    })
+    return df.sort_values(by=['race', competitor]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('competitor_type, resource', [('driver', 'driverStandings'), ('constructor', 'constructorStandings')])
+def test_points_from_results_match_standings_in_a_season_with_sprints(competitor_type, resource):
+    competitor = competitor_type + 'ID'
+    sprint_df = data_processor.make_results_df([('SprintResults', load_fixture('2021/sprint.json?limit=1000&offset=0'))])
+    assert sprint_df['points'].sum() > 0
+    results_df = data_processor.append_df(data_processor.make_results_df([('Results', load_fixture('2021/results.json?limit=1000&offset=0'))]), sprint_df)
+    competitors = load_fixture('2021/{}s.json?limit=1000&offset=0'.format(competitor_type))
+    competitor_list = [row[competitor_type + 'Id'] for row in competitors['MRData'][competitor_type.capitalize() + 'Table'][competitor_type.capitalize() + 's']]
+
+    make_df = data_processor.make_driver_df if competitor_type == 'driver' else data_processor.make_constructor_df
+    races = {race: make_df(load_fixture('2021/{}/{}.json?limit=1000'.format(race, resource))) for race in range(0, season_length)}
+
+    derived = data_processor.build_points_df_from_results(results_df, competitor_list, competitor, season_length)
+    standings = data_processor.build_points_df(competitor_list, competitor, season_length, races)
+    pd.testing.assert_frame_equal(normalize(derived, competitor), normalize(standings, competitor))
+
+
+@pytest.mark.parametrize('year, competitor_type', [(1997, 'driver'), (1984, 'constructor'), (2007, 'constructor'), (2020, 'constructor')])
+def test_excluded_seasons_use_the_standings_after_each_race(monkeypatch, year, competitor_type):
+    # Seasons with exclusions or points deductions must not be derived from the
+    # race results, which don't include them.
+    requested = []
+
+    async def get_races(season_length, competitor_type, year):
+        requested.append(year)
+        return {race: pd.DataFrame({competitor_type + 'ID': ['a'], 'points': [str(race)]}) for race in range(0, season_length)}, {}
+
+    def get_season_results(year):
+        raise AssertionError('Points for {} were derived from the results'.format(year))
+
+    monkeypatch.setattr(local_store, 'backend', 'api')
+    monkeypatch.setattr(data_scraper, 'get_races', get_races)
+    monkeypatch.setattr(data_scraper, 'get_season_results', get_season_results)
+
+    assert not data_scraper.can_derive_points(year, competitor_type)
+    points_df = data_scraper.fetch_points(year, competitor_type, 3, ['a'])
+    assert requested == [year]
+    assert not points_df.attrs['incomplete']
+
+
+@pytest.mark.parametrize('year, competitor_type', [(1991, 'driver'), (2021, 'driver'), (1979, 'constructor'), (2021, 'constructor')])
+def test_other_seasons_are_derived_from_the_results(year, competitor_type):
+    assert data_scraper.can_derive_points(year, competitor_type)
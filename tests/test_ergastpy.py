@@ -0,0 +1,60 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import ergastpy
+import http_client
+import local_store
+
+
+def use_responses(monkeypatch, responses):
+    # Serves the batch's requests from a dict of URL -> response.
+    async def fetch_all(urls, paged=False):
+        return {key: responses[url] for key, url in urls.items()}, {}
+
+    monkeypatch.setattr(local_store, 'backend', 'api')
+    monkeypatch.setattr(ergastpy.fetch_scheduler, 'fetch_all', fetch_all)
+
+
+def make_response(rows):
+    # A response to a query_constructor_url request with a season per row.
+    lists = [{'season': str(season), 'round': '1', 'ConstructorStandings': [{
+        'position': '1', 'positionText': '1', 'points': '10', 'wins': '1',
+        'Constructor': {'constructorId': constructor, 'name': constructor, 'nationality': 'British'},
+    }]} for constructor, season in rows]
+    return {'MRData': {'total': str(len(lists)), 'StandingsTable': {'StandingsLists': lists}}}
+
+
+def test_batch_leaves_out_empty_responses(monkeypatch):
+    use_responses(monkeypatch, {
+        ergastpy.query_constructor_url('a'): make_response([('a', 1990), ('a', 1991)]),
+        ergastpy.query_constructor_url('b'): make_response([]),
+    })
+    df = ergastpy.query_constructor_batch(['a', 'b'])
+    assert df['season'].tolist() == [1990, 1991]
+    assert df.attrs['incomplete']
+
+
+def test_batch_ids_are_categories(monkeypatch):
+    use_responses(monkeypatch, {
+        ergastpy.query_constructor_url('a'): make_response([('a', 1990)]),
+        ergastpy.query_constructor_url('b'): make_response([('b', 1990)]),
+    })
+    df = ergastpy.query_constructor_batch(['a', 'b'])
+    assert df['constructorID'].dtype.name == ergastpy.driver_key_fields['driverID'] == 'category'
+    assert df['constructorID'].tolist() == ['a', 'b']
+    assert not df.attrs['incomplete']
+
+
+def test_batch_parser_errors_are_raised(monkeypatch):
+    # Only empty responses count as failed requests, not responses the parser
+    # can't handle
+    response = make_response([('a', 1990)])
+    del response['MRData']['StandingsTable']['StandingsLists']
+    use_responses(monkeypatch, {ergastpy.query_constructor_url('a'): response})
+    with pytest.raises(KeyError):
+        ergastpy.query_constructor_batch(['a'])
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import sys
+import urllib.parse
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import fetch_scheduler
+import http_client
+import response_parser
+
+
+def make_season(race_count, drivers_per_race):
+    # Every result of a season, as (round, driver id) pairs in the API's order.
+    return [(race, 'driver{}'.format(driver)) for race in range(1, race_count + 1) for driver in range(drivers_per_race)]
+
+
+def make_page(rows, limit, offset):
+    # Builds the page of a results query the way Ergast does, counting results
+    # rather than races, so a race can be split across two pages.
+    races = []
+    for race, driver in rows[offset:offset + limit]:
+        if not races or races[-1]['round'] != str(race):
+            races.append({'season': '2021', 'round': str(race), 'Results': []})
+        races[-1]['Results'].append({'Driver': {'driverId': driver}})
+    return {'MRData': {'limit': str(limit), 'offset': str(offset), 'total': str(len(rows)),
+                       'RaceTable': {'season': '2021', 'Races': races}}}
+
+
+def serve(monkeypatch, rows, max_limit):
+    # Answers fetch_page from rows, capping the page size at max_limit like
+    # the API does. Returns the list of URLs requested.
+    requested = []
+
+    async def fetch_page(url, semaphore, limiter):
+        requested.append(url)
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+        await asyncio.sleep(0.01 * (len(requested) % 3))
+        return make_page(rows, min(int(query['limit']), max_limit), int(query['offset']))
+
+    monkeypatch.setattr(fetch_scheduler, 'fetch_page', fetch_page)
+    return requested
+
+
+def flatten(response):
+    return [(int(race['round']), result['Driver']['driverId'])
+            for race in response_parser.races_table(response) for result in race['Results']]
+
+
+def test_get_json_paged_merges_every_page(monkeypatch):
+    rows = make_season(5, 7)
+    requested = serve(monkeypatch, rows, max_limit=1000)
+    response = http_client.run(fetch_scheduler.get_json_paged('http://ergast.com/api/f1/2021/results.json?limit=1000', page_size=10))
+
+    assert flatten(response) == rows
+    assert len(response_parser.races_table(response)) == 5
+    assert len(requested) == 4
+
+
+def test_get_json_paged_steps_by_the_limit_the_api_used(monkeypatch):
+    rows = make_season(3, 5)
+    requested = serve(monkeypatch, rows, max_limit=4)
+    response = http_client.run(fetch_scheduler.get_json_paged('http://ergast.com/api/f1/2021/results.json', page_size=10))
+
+    assert flatten(response) == rows
+    assert len(requested) == 4
+
+
+def test_get_json_paged_makes_one_request_for_one_page(monkeypatch):
+    rows = make_season(2, 3)
+    requested = serve(monkeypatch, rows, max_limit=1000)
+    response = http_client.run(fetch_scheduler.get_json_paged('http://ergast.com/api/f1/2021/results.json', page_size=10))
+
+    assert flatten(response) == rows
+    assert len(requested) == 1
+
+
+def test_page_url_replaces_limit_and_offset():
+    url = fetch_scheduler.page_url('http://ergast.com/api/f1/2021/results.json?limit=1000', 100, 200)
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+    assert query == {'limit': ['100'], 'offset': ['200']}
+
+
+class FakeClock:
+    # Stands in for time.monotonic and asyncio.sleep in fetch_scheduler, so
+    # waiting on the rate limiter takes no real time.
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def use_fake_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(fetch_scheduler.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(fetch_scheduler.asyncio, 'sleep', clock.sleep)
+    return clock
+
+
+def acquire_times(bucket, clock, count):
+    # Takes count tokens one after the other and returns the time each was taken at.
+    async def take():
+        times = []
+        for _ in range(count):
+            await bucket.acquire()
+            times.append(clock.now)
+        return times
+    return asyncio.run(take())
+
+
+def test_token_bucket_allows_a_burst_then_the_rate(monkeypatch):
+    clock = use_fake_clock(monkeypatch)
+    bucket = fetch_scheduler.TokenBucket(rate=4, capacity=3)
+    times = acquire_times(bucket, clock, 7)
+    assert times[:3] == [0, 0, 0]
+    assert times[3:] == pytest.approx([0.25, 0.5, 0.75, 1.0])
+
+
+def test_token_bucket_refills_up_to_its_capacity(monkeypatch):
+    clock = use_fake_clock(monkeypatch)
+    bucket = fetch_scheduler.TokenBucket(rate=4, capacity=3)
+    acquire_times(bucket, clock, 3)
+    clock.now += 10
+    times = acquire_times(bucket, clock, 4)
+    assert times[:3] == [10, 10, 10]
+    assert times[3] == pytest.approx(10.25)
+
+
+def test_token_bucket_is_shared_by_concurrent_callers(monkeypatch):
+    clock = use_fake_clock(monkeypatch)
+    bucket = fetch_scheduler.TokenBucket(rate=2, capacity=1)
+
+    async def take_all():
+        async def take():
+            await bucket.acquire()
+            return clock.now
+        return await asyncio.gather(*[take() for _ in range(5)])
+
+    assert sorted(asyncio.run(take_all())) == pytest.approx([0, 0.5, 1.0, 1.5, 2.0])
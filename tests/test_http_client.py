@@ -0,0 +1,48 @@
+import os
+import sys
+import threading
+import time
+import pytest
+import requests
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import fetch_scheduler
+import http_client
+import mock_ergast
+import response_cache
+
+
+@pytest.fixture
+def mock(tmp_path, monkeypatch):
+    # A mock API with nothing to serve, so every request gets a 404. Responses
+    # are slow enough for a second caller to join a request in flight.
+    mock = mock_ergast.MockErgast(use_store=False, latency=0.5)
+    monkeypatch.setattr(http_client, 'base_url', mock.start())
+    monkeypatch.setattr(response_cache, 'default_cache', response_cache.ResponseCache(str(tmp_path / 'cache.sqlite')))
+    yield mock
+    mock.stop()
+
+
+def test_async_waiter_gets_the_error_of_a_sync_leader(mock):
+    url = http_client.ergast_url + '/1950/1/driverStandings.json'
+    errors = []
+
+    def leader():
+        try:
+            http_client.get_json(url)
+        except Exception as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    time.sleep(0.2)
+    responses, failures = http_client.run(fetch_scheduler.fetch_all({'race': url}))
+    thread.join()
+
+    assert responses == {}
+    assert isinstance(failures['race'], requests.HTTPError)
+    assert len(errors) == 1 and isinstance(errors[0], requests.HTTPError)
+    assert mock.request_count == 1
+    assert http_client.requests_in_flight.coalesced >= 1
@@ -0,0 +1,75 @@
+import math
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import plotter
+
+
+def reference_lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets as written in Steinarsson's thesis, one
+    # point at a time.
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    keep = [0]
+    a = 0
+    for i in range(threshold - 2):
+        next_start = int(math.floor((i + 1) * every)) + 1
+        next_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+
+        start = int(math.floor(i * every)) + 1
+        end = int(math.floor((i + 1) * every)) + 1
+        best, best_area = start, -1
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    keep.append(n - 1)
+    return keep
+
+
+@pytest.mark.parametrize('n, threshold', [(10, 3), (100, 7), (400, 100), (1001, 50), (50, 49)])
+def test_lttb_matches_reference(n, threshold):
+    rng = np.random.default_rng(n)
+    x = np.arange(n, dtype=float)
+    y = np.cumsum(rng.integers(0, 26, n)).astype(float)
+    assert plotter.lttb(x, y, threshold).tolist() == reference_lttb(x.tolist(), y.tolist(), threshold)
+
+
+def test_lttb_keeps_the_ends_and_a_spike():
+    x = np.arange(200, dtype=float)
+    y = np.zeros(200)
+    y[123] = 50.0
+    keep = plotter.lttb(x, y, 10)
+    assert len(keep) == 10
+    assert keep[0] == 0 and keep[-1] == 199
+    assert 123 in keep
+    assert (np.diff(keep) > 0).all()
+
+
+@pytest.mark.parametrize('threshold', [0, 2, 20, 25])
+def test_lttb_keeps_everything_when_it_cant_or_doesnt_need_to_downsample(threshold):
+    x = np.arange(20, dtype=float)
+    assert plotter.lttb(x, x, threshold).tolist() == list(range(20))
+
+
+def test_downsample_keeps_real_rows_of_every_group():
+    df = pd.DataFrame({
+        'race': np.tile(np.arange(1, 301), 2),
+        'points': np.concatenate([np.arange(300), np.arange(300) * 2]).astype(float),
+        'driverID': np.repeat(['a', 'b'], 300),
+    })
+    downsampled = plotter.downsample(df, 'race', 'points', 'driverID', 50)
+    assert downsampled.groupby('driverID').size().tolist() == [50, 50]
+    assert downsampled.index.isin(df.index).all()
+    pd.testing.assert_frame_equal(downsampled, df.loc[downsampled.index])
+    assert plotter.downsample(df, 'race', 'points', 'driverID', 300) is df
@@ -0,0 +1,76 @@
+import os
+import sys
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import json_codec
+import response_cache
+
+historical_url = 'http://ergast.com/api/f1/1985/1/results.json'
+current_url = 'http://ergast.com/api/f1/current/last/results.json'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Replaces the time the cache sees with one the tests move forward. It
+    # starts from the real time, as date.today() is read from it too.
+    now = [response_cache.time.time()]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def make_cache(tmp_path, **kwargs):
+    return response_cache.ResponseCache(str(tmp_path / 'cache.sqlite'), **kwargs)
+
+
+def test_ttl_depends_on_the_season(tmp_path):
+    cache = make_cache(tmp_path, historical_ttl=None, current_ttl=60)
+    assert cache.ttl_for(historical_url) is None
+    assert cache.ttl_for('http://ergast.com/api/f1/1985.json') is None
+    assert cache.ttl_for(current_url) == 60
+    assert cache.ttl_for('http://ergast.com/api/f1/{}/results.json'.format(response_cache.date.today().year)) == 60
+    # Queries spanning every season change with the current one
+    assert cache.ttl_for('http://ergast.com/api/f1/driverStandings/1.json') == 60
+
+
+def test_current_season_responses_expire(tmp_path, clock):
+    cache = make_cache(tmp_path, current_ttl=60)
+    cache.set(current_url, {'round': 1})
+    cache.set(historical_url, {'round': 2})
+
+    clock[0] += 59
+    assert cache.get(current_url) == {'round': 1}
+    clock[0] += 2
+    assert cache.get(current_url) is None
+    clock[0] += 10 ** 6
+    assert cache.get(historical_url) == {'round': 2}
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_responses_are_evicted_first(tmp_path, clock):
+    payload = {'rows': 'x' * 100}
+    size = len(json_codec.dumps(payload))
+    cache = make_cache(tmp_path, max_bytes=2 * size)
+    urls = ['http://ergast.com/api/f1/1985/{}/results.json'.format(race) for race in range(1, 4)]
+
+    cache.set(urls[0], payload)
+    clock[0] += 1
+    cache.set(urls[1], payload)
+    clock[0] += 1
+    # Reading the first response makes the second the least recently used
+    assert cache.get(urls[0]) == payload
+    clock[0] += 1
+    cache.set(urls[2], payload)
+
+    assert cache.get(urls[1]) is None
+    assert cache.get(urls[0]) == payload
+    assert cache.get(urls[2]) == payload
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] <= 2 * size
+
+
+def test_cache_is_shared_through_the_file(tmp_path):
+    make_cache(tmp_path).set(historical_url, {'round': 1})
+    assert make_cache(tmp_path).get(historical_url) == {'round': 1}
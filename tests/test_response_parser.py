@@ -0,0 +1,62 @@
+import copy
+import os
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import response_parser
+
+
+def results_response(races, offset=0, limit=30, total=None):
+    # Builds an Ergast results response from a list of (round, [driver ids]).
+    rows = sum(len(drivers) for race, drivers in races)
+    return {'MRData': {
+        'limit': str(limit),
+        'offset': str(offset),
+        'total': str(rows if total is None else total),
+        'RaceTable': {'season': '2021', 'Races': [
+            {'season': '2021', 'round': str(race), 'raceName': 'Race {}'.format(race),
+             'Results': [{'position': str(position), 'Driver': {'driverId': driver}} for position, driver in enumerate(drivers, 1)]}
+            for race, drivers in races
+        ]},
+    }}
+
+
+def result_ids(response):
+    return [(race['round'], [result['Driver']['driverId'] for result in race['Results']]) for race in response_parser.races_table(response)]
+
+
+def test_merge_page_joins_a_race_split_across_pages():
+    response = results_response([(1, ['a', 'b', 'c']), (2, ['a'])], limit=4, total=7)
+    page = results_response([(2, ['b', 'c']), (3, ['a'])], offset=4, limit=4, total=7)
+
+    merged = response_parser.merge_page(response, page)
+    assert result_ids(merged) == [('1', ['a', 'b', 'c']), ('2', ['a', 'b', 'c']), ('3', ['a'])]
+    # The split race's results keep their positions
+    assert [result['position'] for result in response_parser.races_table(merged)[1]['Results']] == ['1', '1', '2']
+
+
+def test_merge_page_keeps_races_that_start_on_a_new_page_apart():
+    response = results_response([(1, ['a', 'b'])], limit=2, total=4)
+    page = results_response([(2, ['a', 'b'])], offset=2, limit=2, total=4)
+
+    merged = response_parser.merge_page(response, page)
+    assert result_ids(merged) == [('1', ['a', 'b']), ('2', ['a', 'b'])]
+
+
+def test_merge_page_only_touches_tables():
+    response = results_response([(1, ['a'])], limit=1, total=2)
+    page = results_response([(2, ['b'])], offset=1, limit=1, total=2)
+    before = copy.deepcopy(response['MRData'])
+
+    merged = response_parser.merge_page(response, page)
+    assert {key: value for key, value in merged['MRData'].items() if key != 'RaceTable'} == \
+        {key: value for key, value in before.items() if key != 'RaceTable'}
+    assert merged['MRData']['RaceTable']['season'] == '2021'
+
+
+def test_merge_page_of_an_empty_page():
+    response = results_response([(1, ['a'])])
+    merged = response_parser.merge_page(response, results_response([], offset=1, total=1))
+    assert result_ids(merged) == [('1', ['a'])]
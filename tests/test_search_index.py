@@ -0,0 +1,61 @@
+import os
+import sys
+import pandas as pd
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import search_index
+
+drivers = pd.DataFrame({
+    'driverId': ['hamilton', 'perez', 'max_verstappen', 'jos_verstappen', 'hulkenberg', 'raikkonen'],
+    'driver': ['Lewis Hamilton', 'Sergio Pérez', 'Max Verstappen', 'Jos Verstappen', 'Nico Hülkenberg', 'Kimi Räikkönen'],
+    'nationality': ['British', 'Mexican', 'Dutch', 'Dutch', 'German', 'Finnish'],
+})
+index = search_index.SearchIndex(drivers, ['driverId', 'driver', 'nationality'])
+
+
+def found(query, limit=None):
+    return index.find(query, limit)['driverId'].tolist()
+
+
+def test_normalize_strips_case_accents_and_punctuation():
+    assert search_index.normalize('Hülkenberg') == 'hulkenberg'
+    assert search_index.normalize('max_verstappen') == 'max verstappen'
+    assert search_index.normalize('  Sergio  PÉREZ ') == 'sergio perez'
+
+
+def test_matches_without_accents_or_case():
+    assert found('perez') == ['perez']
+    assert found('RAIKKONEN') == ['raikkonen']
+
+
+def test_exact_matches_rank_above_prefixes_and_substrings():
+    scores = dict(index.search('dutch'))
+    assert scores[2] == scores[3] == search_index.exact_score
+    assert index.search('verst')[0][1] == search_index.prefix_score
+    assert index.search('stapp')[0][1] == search_index.substring_score
+
+
+def test_scores_add_up_over_the_words_of_a_query():
+    assert found('max verstappen') == ['max_verstappen', 'jos_verstappen']
+    assert found('verstappen jos')[0] == 'jos_verstappen'
+
+
+def test_ties_keep_the_dataframe_order():
+    assert found('verstappen') == ['max_verstappen', 'jos_verstappen']
+
+
+def test_misspellings_match_fuzzily():
+    assert found('hamiltn') == ['hamilton']
+    score = index.search('hamiltn')[0][1]
+    assert 0 < score < search_index.substring_score
+
+
+def test_single_letters_only_match_as_prefixes():
+    assert set(found('m')) == {'max_verstappen', 'perez'}
+
+
+def test_no_match_and_limit():
+    assert found('zzzzzz') == []
+    assert len(found('verstappen', limit=1)) == 1